@@ -1,17 +1,15 @@
 import pygame
+import argparse
 import math
-import random
+import os
 import sys
-import heapq
-from collections import deque, defaultdict
 
-# Initialize Pygame
-pygame.init()
+from hex_engine import GameState, ROWS, COLS, MAX_BOARD_SIZE, AI_PLAYER, get_neighbors
+from hex_records import RecordWriter, game_record
+from hex_worker import SearchWorker
 
 # Screen Settings
 WIDTH, HEIGHT = 1200, 800  # Increased width for info panel
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Hex Game Board with Image Obstacles")
 
 # Colors
 BACKGROUND_COLOR = (255, 255, 255)
@@ -24,62 +22,98 @@ INFO_PANEL_COLOR = (240, 240, 240)
 TEXT_COLOR = (0, 0, 0)
 
 # Board Settings
-ROWS, COLS = 8, 8  # Slightly smaller board for better gameplay
-HEX_RADIUS = 25  # Size of hexagons
+MAX_HEX_RADIUS = 25  # Hexagons shrink below this to fit larger boards
+MIN_HEX_RADIUS = 4
+BOARD_MARGIN = 30  # Space kept around the board and its territory bars
+TERRITORY_WIDTH = 10
+INFO_PANEL_WIDTH = 400
+
+# Layout, recomputed by fit_layout() for the board and window size
+HEX_RADIUS = MAX_HEX_RADIUS  # Size of hexagons
 BOARD_OFFSET_X = 100
 BOARD_OFFSET_Y = 100
 INFO_PANEL_X = 800  # X position for info panel
 
-# Game state
-TURN = 0  # Player turn (0: Red, 1: Blue)
-AI_PLAYER = 1  # AI plays as Blue
-hex_states = {}  # (row, col) -> color
-obstacles = set()  # Set of obstacle hexes
-game_over = False
-winner = None
-bonus_move_counter = random.randint(1, 5)  # Initialize bonus move counter
-bonus_move_active = False
-bonus_player = None
-move_count = 0
-
-# Font setup
-font = pygame.font.SysFont("Arial", 24)
-small_font = pygame.font.SysFont("Arial", 18)
-large_font = pygame.font.SysFont("Arial", 36)
-
-# Load obstacle image and scale it
-try:
-    obstacle_img = pygame.image.load("obstacle.png")
-    obstacle_img = pygame.transform.scale(obstacle_img, (HEX_RADIUS * 1.5, HEX_RADIUS * 1.5))
-except pygame.error:
-    # Create a default obstacle image if file not found
-    obstacle_img = pygame.Surface((HEX_RADIUS * 1.5, HEX_RADIUS * 1.5), pygame.SRCALPHA)
-    pygame.draw.circle(obstacle_img, (100, 100, 100), 
-                      (HEX_RADIUS * 0.75, HEX_RADIUS * 0.75), 
-                      HEX_RADIUS * 0.7)
-    pygame.draw.circle(obstacle_img, (50, 50, 50), 
-                      (HEX_RADIUS * 0.75, HEX_RADIUS * 0.75), 
-                      HEX_RADIUS * 0.7, 3)
-
 # Function to calculate hex corner points
 def hex_corner(center_x, center_y, size, i):
     angle_deg = 60 * i
     angle_rad = math.radians(angle_deg)
     return (center_x + size * math.cos(angle_rad), center_y + size * math.sin(angle_rad))
 
+# Render caches, rebuilt by build_render_cache() on restart or resize
+static_layer = None  # Empty grid, territory bars and fixed panel text
+obstacle_tile = None  # Obstacle image clipped to the hex outline
+hex_shapes = {}  # (row, col) -> (corner points, fill points, bounding rect)
+drawn_cells = {}  # (row, col) -> what is currently painted there
+drawn_lines = {}  # panel slot -> (text, color) currently painted there
+text_cache = {}  # (font, text, color) -> rendered surface
+dirty_rects = []  # Screen areas to push with the next display update
+dialog_drawn = False
+
+# Function to render text once and reuse the surface
+def render_text(text_font, text, color):
+    key = (text_font, text, color)
+    if key not in text_cache:
+        if len(text_cache) > 256:
+            text_cache.clear()  # Progress lines change every frame; keep the cache small
+        text_cache[key] = text_font.render(text, True, color)
+    return text_cache[key]
+
 # Function to draw hexagons
-def draw_hex(x, y, row, col):
-    points = [hex_corner(x, y, HEX_RADIUS, i) for i in range(6)]
+def draw_hex(row, col, look):
+    # Fill slightly inside the outline so neighboring fills never overlap
+    # and the result does not depend on the order hexes were painted in
+    _, fill_points, _ = hex_shapes[(row, col)]
     
     # Draw obstacle image
-    if (row, col) in obstacles:
-        screen.blit(obstacle_img, obstacle_img.get_rect(center=(x, y)))
+    if look == "obstacle":
+        pygame.draw.polygon(screen, HEX_COLOR, fill_points)
+        screen.blit(obstacle_tile, obstacle_tile.get_rect(center=get_hex_center(row, col)))
     else:
-        color = hex_states.get((row, col), HEX_COLOR)  # Default or player color
-        pygame.draw.polygon(screen, color, points)
+        color = HEX_COLOR if look is None else PLAYER_COLORS[look]  # Default or player color
+        pygame.draw.polygon(screen, color, fill_points)
+
+    # Draw borders, including the neighbors' borders the fill painted over
+    for cell in [(row, col)] + get_neighbors(row, col, ROWS, COLS):
+        pygame.draw.polygon(screen, BORDER_COLOR, hex_shapes[cell][0], 2)  # Black border
+
+# Function to load the obstacle image, or draw a default one if the file is missing
+def load_obstacle_image():
+    try:
+        return pygame.image.load("obstacle.png")
+    except pygame.error:
+        size = MAX_HEX_RADIUS * 1.5
+        image = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(image, (100, 100, 100), (size / 2, size / 2), MAX_HEX_RADIUS * 0.7)
+        pygame.draw.circle(image, (50, 50, 50), (size / 2, size / 2), MAX_HEX_RADIUS * 0.7, 3)
+        return image
 
-    # Draw border
-    pygame.draw.polygon(screen, BORDER_COLOR, points, 2)  # Black border
+# Function to clip the obstacle image, scaled to the current hexagons, to a hexagon
+def make_obstacle_tile():
+    size = HEX_RADIUS * 2
+    tile = pygame.Surface((size, size), pygame.SRCALPHA)
+    points = [hex_corner(HEX_RADIUS, HEX_RADIUS, HEX_RADIUS - 1, i) for i in range(6)]
+    pygame.draw.polygon(tile, (255, 255, 255, 255), points)
+    scaled = pygame.transform.smoothscale(obstacle_img, (HEX_RADIUS * 1.5, HEX_RADIUS * 1.5))
+    image = pygame.Surface((size, size), pygame.SRCALPHA)
+    image.blit(scaled, scaled.get_rect(center=(HEX_RADIUS, HEX_RADIUS)))
+    tile.blit(image, (0, 0), special_flags=pygame.BLEND_RGBA_MIN)
+    return tile
+
+# Function to size the hexagons and place the board and panel for the window
+def fit_layout():
+    global HEX_RADIUS, BOARD_OFFSET_X, BOARD_OFFSET_Y, INFO_PANEL_X
+    INFO_PANEL_X = max(WIDTH - INFO_PANEL_WIDTH, 0)
+    bars = 2 * TERRITORY_WIDTH
+    # Board extent in hex radii, territory bars included: COLS * 1.5 + 2 wide, ROWS * sqrt(3) + 2 high
+    fit_x = (INFO_PANEL_X - 2 * BOARD_MARGIN - bars) / (COLS * 1.5 + 2)
+    fit_y = (HEIGHT - 2 * BOARD_MARGIN - bars) / (ROWS * math.sqrt(3) + 2)
+    HEX_RADIUS = int(max(MIN_HEX_RADIUS, min(MAX_HEX_RADIUS, fit_x, fit_y)))
+    board_width = HEX_RADIUS * (COLS * 1.5 + 2) + bars
+    board_height = HEX_RADIUS * (ROWS * math.sqrt(3) + 2) + bars
+    # Center the board left of the panel; offsets are the first hex center
+    BOARD_OFFSET_X = (INFO_PANEL_X - board_width) / 2 + HEX_RADIUS + TERRITORY_WIDTH
+    BOARD_OFFSET_Y = (HEIGHT - board_height) / 2 + HEX_RADIUS + TERRITORY_WIDTH
 
 # Function to get hex center coordinates
 def get_hex_center(row, col):
@@ -90,24 +124,16 @@ def get_hex_center(row, col):
         y += HEX_RADIUS * math.sqrt(3) / 2
     return x, y
 
-# Function to generate board positions
-def generate_board():
-    hexagons = []
-    for row in range(ROWS):
-        for col in range(COLS):
-            x, y = get_hex_center(row, col)
-            hexagons.append(((x, y), row, col))
-            draw_hex(x, y, row, col)
-    
-    # Draw player territories (top/bottom for Red, left/right for Blue)
+# Function to draw player territories (top/bottom for Red, left/right for Blue)
+def draw_territories(surface):
     for col in range(COLS):
         # Red's top territory
-        pygame.draw.rect(screen, (255, 200, 200), 
+        pygame.draw.rect(surface, (255, 200, 200), 
                         (col * HEX_RADIUS * 1.5 + BOARD_OFFSET_X - HEX_RADIUS/2, 
                          BOARD_OFFSET_Y - HEX_RADIUS - 10, 
                          HEX_RADIUS, 10))
         # Red's bottom territory
-        pygame.draw.rect(screen, (255, 200, 200), 
+        pygame.draw.rect(surface, (255, 200, 200), 
                         (col * HEX_RADIUS * 1.5 + BOARD_OFFSET_X - HEX_RADIUS/2, 
                          BOARD_OFFSET_Y + ROWS * HEX_RADIUS * math.sqrt(3) + HEX_RADIUS, 
                          HEX_RADIUS, 10))
@@ -117,127 +143,28 @@ def generate_board():
         y_offset = 0
         if row % 2 == 1:
             y_offset = HEX_RADIUS * math.sqrt(3) / 2
-        pygame.draw.rect(screen, (200, 200, 255), 
+        pygame.draw.rect(surface, (200, 200, 255), 
                         (BOARD_OFFSET_X - HEX_RADIUS - 10, 
                          row * HEX_RADIUS * math.sqrt(3) + BOARD_OFFSET_Y + y_offset - HEX_RADIUS/2, 
                          10, HEX_RADIUS))
         # Blue's right territory
-        pygame.draw.rect(screen, (200, 200, 255), 
+        pygame.draw.rect(surface, (200, 200, 255), 
                         (BOARD_OFFSET_X + COLS * HEX_RADIUS * 1.5 + HEX_RADIUS, 
                          row * HEX_RADIUS * math.sqrt(3) + BOARD_OFFSET_Y + y_offset - HEX_RADIUS/2, 
                          10, HEX_RADIUS))
-    
-    return hexagons
-
-# Function to get clicked hex
-def get_clicked_hex(pos, hexagons):
-    mx, my = pos
-    for (hx, hy), row, col in hexagons:
-        dx, dy = mx - hx, my - hy
-        distance = math.sqrt(dx**2 + dy**2)
-        if distance < HEX_RADIUS:
-            return row, col
-    return None
-
-# Function to get neighboring hex coordinates
-def get_neighbors(row, col):
-    neighbors = []
-    # Define the six neighbor directions
-    even_row_neighbors = [(-1, 0), (-1, 1), (0, 1), (1, 0), (0, -1), (-1, -1)]
-    odd_row_neighbors = [(-1, 0), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
-    
-    directions = odd_row_neighbors if col % 2 == 1 else even_row_neighbors
-    
-    for dr, dc in directions:
-        nr, nc = row + dr, col + dc
-        if 0 <= nr < ROWS and 0 <= nc < COLS:
-            neighbors.append((nr, nc))
-    
-    return neighbors
-
-def check_draw():
-    available_cells = ROWS * COLS - len(obstacles) - len(hex_states)
-    return available_cells == 0
-
-# Function to check if a player has won
-def check_win():
-    # For Red player (top to bottom)
-    if has_path(0, ROWS-1):
-        return 0  # Red wins
-    
-    # For Blue player (left to right)
-    if has_path_horizontal():
-        return 1  # Blue wins
-    
-    return None
-
-# BFS to check if player has a connected path
-def has_path(start_edge, end_edge):
-    """Check if Red player has a path from top to bottom"""
-    # Create virtual nodes for the top and bottom edges
-    visited = set()
-    queue = deque()
-    
-    # Add all top-row red hexes to the queue
-    for col in range(COLS):
-        if hex_states.get((0, col)) == PLAYER_COLORS[0]:
-            queue.append((0, col))
-            visited.add((0, col))
-    
-    while queue:
-        row, col = queue.popleft()
-        
-        # If we reached the bottom edge
-        if row == end_edge:
-            return True
-        
-        # Check neighbors
-        for nr, nc in get_neighbors(row, col):
-            if (nr, nc) not in visited and hex_states.get((nr, nc)) == PLAYER_COLORS[0]:
-                visited.add((nr, nc))
-                queue.append((nr, nc))
-    
-    return False
 
-def has_path_horizontal():
-    """Check if Blue player has a path from left to right"""
-    visited = set()
-    queue = deque()
-    
-    # Add all left-column blue hexes to the queue
-    for row in range(ROWS):
-        if hex_states.get((row, 0)) == PLAYER_COLORS[1]:
-            queue.append((row, 0))
-            visited.add((row, 0))
-    
-    while queue:
-        row, col = queue.popleft()
-        
-        # If we reached the right edge
-        if col == COLS - 1:
-            return True
-        
-        # Check neighbors
-        for nr, nc in get_neighbors(row, col):
-            if (nr, nc) not in visited and hex_states.get((nr, nc)) == PLAYER_COLORS[1]:
-                visited.add((nr, nc))
-                queue.append((nr, nc))
-    
-    return False
-
-# Draw information panel
-def draw_info_panel():
+# Function to draw the parts of the information panel that never change
+def draw_static_panel(surface):
     panel_width = WIDTH - INFO_PANEL_X
     
     # Draw panel background
-    pygame.draw.rect(screen, INFO_PANEL_COLOR, (INFO_PANEL_X, 0, panel_width, HEIGHT))
-    pygame.draw.line(screen, BORDER_COLOR, (INFO_PANEL_X, 0), (INFO_PANEL_X, HEIGHT), 2)
+    pygame.draw.rect(surface, INFO_PANEL_COLOR, (INFO_PANEL_X, 0, panel_width, HEIGHT))
+    pygame.draw.line(surface, BORDER_COLOR, (INFO_PANEL_X, 0), (INFO_PANEL_X, HEIGHT), 2)
     
     # Game title
-    title = large_font.render("HEX GAME", True, TEXT_COLOR)
-    screen.blit(title, (INFO_PANEL_X + 20, 20))
+    surface.blit(render_text(large_font, "HEX GAME", TEXT_COLOR), (INFO_PANEL_X + 20, 20))
     
-    # Game instructions
+    # Game instructions (the bonus rule line is drawn by panel_lines)
     instructions = [
         "Instructions:",
         "- Players take turns placing pieces on the board",
@@ -247,7 +174,7 @@ def draw_info_panel():
         "- Obstacles cannot be occupied",
         "",
         "Bonus Move:",
-        f"- After {bonus_move_counter} moves, current player gets an extra turn",
+        None,
         "",
         "Controls:",
         "- Click on a hex to place your piece",
@@ -257,39 +184,124 @@ def draw_info_panel():
     
     y_offset = 80
     for line in instructions:
-        text = small_font.render(line, True, TEXT_COLOR)
-        screen.blit(text, (INFO_PANEL_X + 20, y_offset))
+        if line:
+            surface.blit(render_text(small_font, line, TEXT_COLOR), (INFO_PANEL_X + 20, y_offset))
         y_offset += 25
     
-    # Game status
+    # Game status separator
     y_offset = 500
-    pygame.draw.line(screen, BORDER_COLOR, (INFO_PANEL_X + 10, y_offset - 10), 
+    pygame.draw.line(surface, BORDER_COLOR, (INFO_PANEL_X + 10, y_offset - 10), 
                      (WIDTH - 10, y_offset - 10), 2)
+
+# Function to build the cached layers and paint the whole window once
+def build_render_cache():
+    global static_layer, obstacle_tile, dialog_drawn
+    fit_layout()
+    hex_shapes.clear()
+    drawn_cells.clear()
+    drawn_lines.clear()
+    dialog_drawn = False
+    obstacle_tile = make_obstacle_tile()
+
+    static_layer = pygame.Surface(screen.get_size())
+    static_layer.fill(BACKGROUND_COLOR)
+    for row in range(ROWS):
+        for col in range(COLS):
+            x, y = get_hex_center(row, col)
+            points = [hex_corner(x, y, HEX_RADIUS, i) for i in range(6)]
+            fill_points = [hex_corner(x, y, HEX_RADIUS - 1, i) for i in range(6)]
+            rect = pygame.draw.polygon(static_layer, HEX_COLOR, points)
+            hex_shapes[(row, col)] = (points, fill_points, rect.inflate(4, 4))
+    for points, _, _ in hex_shapes.values():
+        pygame.draw.polygon(static_layer, BORDER_COLOR, points, 2)
+    draw_territories(static_layer)
+    draw_static_panel(static_layer)
+
+    screen.blit(static_layer, (0, 0))
+    dirty_rects.append(screen.get_rect())
+
+# Function to get clicked hex
+def get_clicked_hex(pos):
+    """Convert a pixel position straight to (row, col), or None off the board"""
+    # Pixel to fractional axial coordinates for flat-topped hexes
+    x = pos[0] - BOARD_OFFSET_X
+    y = pos[1] - BOARD_OFFSET_Y
+    q = (2 / 3 * x) / HEX_RADIUS
+    r = (-1 / 3 * x + math.sqrt(3) / 3 * y) / HEX_RADIUS
+
+    # Cube rounding: round all three coordinates, fix the one that moved most
+    s = -q - r
+    rq, rr, rs = round(q), round(r), round(s)
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+
+    # Axial to the odd-column offset layout used by get_hex_center
+    col = rq
+    row = rr + (rq - (rq & 1)) // 2
+    if 0 <= row < ROWS and 0 <= col < COLS:
+        return row, col
+    return None
+
+# Function to list the information panel text that changes during a game
+def panel_lines():
+    """Dynamic panel text: slot -> (font, text, color, position)"""
+    lines = {"bonus_rule": (small_font, f"- After {state.bonus_move_counter} moves, current player gets an extra turn",
+                            TEXT_COLOR, (INFO_PANEL_X + 20, 80 + 8 * 25))}
+    y_offset = 500
     
     # Current turn
-    current_player = "Bonus: " + PLAYER_NAMES[bonus_player] if bonus_move_active else PLAYER_NAMES[TURN]
-    turn_text = font.render(f"Current Turn: {current_player}", True, PLAYER_COLORS[bonus_player if bonus_move_active else TURN])
-    screen.blit(turn_text, (INFO_PANEL_X + 20, y_offset))
+    current_player = "Bonus: " + PLAYER_NAMES[state.bonus_player] if state.bonus_move_active else PLAYER_NAMES[state.turn]
+    lines["turn"] = (font, f"Current Turn: {current_player}", PLAYER_COLORS[state.current_player()],
+                     (INFO_PANEL_X + 20, y_offset))
     
     # Moves until bonus
-    if not bonus_move_active:
-        moves_left = bonus_move_counter - (move_count % bonus_move_counter)
-        if moves_left == 0:
-            moves_left = bonus_move_counter
-        bonus_text = font.render(f"Moves until bonus: {moves_left}", True, TEXT_COLOR)
-        screen.blit(bonus_text, (INFO_PANEL_X + 20, y_offset + 40))
+    if not state.bonus_move_active:
+        moves_left = state.moves_until_bonus()
+        lines["bonus"] = (font, f"Moves until bonus: {moves_left}", TEXT_COLOR, (INFO_PANEL_X + 20, y_offset + 40))
     else:
-        bonus_text = font.render("BONUS MOVE ACTIVE!", True, HIGHLIGHT_COLOR)
-        screen.blit(bonus_text, (INFO_PANEL_X + 20, y_offset + 40))
+        lines["bonus"] = (font, "BONUS MOVE ACTIVE!", HIGHLIGHT_COLOR, (INFO_PANEL_X + 20, y_offset + 40))
     
-    # Game status
-    if game_over:
-        status = None;
-        if winner:
-            status = font.render(f"Game Over! {PLAYER_NAMES[winner]} wins!", True, PLAYER_COLORS[winner])
+    # Game status, or AI progress while the worker searches
+    status = ("", TEXT_COLOR)
+    if state.game_over:
+        if state.winner is not None:
+            status = (f"Game Over! {PLAYER_NAMES[state.winner]} wins!", PLAYER_COLORS[state.winner])
         else:
-            status = font.render(f"Game Over! It's a Draw!", True, "black")
-        screen.blit(status, (INFO_PANEL_X + 20, y_offset + 80))
+            status = ("Game Over! It's a Draw!", TEXT_COLOR)
+    elif worker.busy:
+        status = (f"AI thinking... depth {worker.depth}, {worker.nodes} nodes", TEXT_COLOR)
+    lines["status"] = (font, *status, (INFO_PANEL_X + 20, y_offset + 80))
+    return lines
+
+# Function to repaint only what changed since the last frame
+def render_frame():
+    global dialog_drawn
+    for cell in hex_shapes:
+        look = "obstacle" if cell in state.obstacles else state.owner(cell)
+        if drawn_cells.get(cell, "unpainted") != look:
+            draw_hex(*cell, look)
+            drawn_cells[cell] = look
+            dirty_rects.append(hex_shapes[cell][2])
+
+    for slot, (text_font, text, color, (x, y)) in panel_lines().items():
+        if drawn_lines.get(slot) != (text, color):
+            area = pygame.Rect(INFO_PANEL_X + 2, y, WIDTH - INFO_PANEL_X - 4, text_font.get_linesize())
+            screen.blit(static_layer, area, area)
+            if text:
+                screen.blit(render_text(text_font, text, color), (x, y))
+            drawn_lines[slot] = (text, color)
+            dirty_rects.append(area)
+
+    # If game is over, draw winner dialog
+    if state.game_over and not dialog_drawn:
+        dirty_rects.append(draw_winner_dialog())
+        dialog_drawn = True
+
+    pygame.display.update(dirty_rects)
+    dirty_rects.clear()
 
 # Draw winner dialog
 def draw_winner_dialog():
@@ -307,275 +319,109 @@ def draw_winner_dialog():
     
     # Winner text
     output_text = "";
-    if winner == None:
-        output_text = large_font.render(f"Its a Draw!", True, "black")
+    if state.winner == None:
+        output_text = render_text(large_font, "Its a Draw!", TEXT_COLOR)
     else:
-        output_text = large_font.render(f"{PLAYER_NAMES[winner]} WINS!", True, PLAYER_COLORS[winner])
+        output_text = render_text(large_font, f"{PLAYER_NAMES[state.winner]} WINS!", PLAYER_COLORS[state.winner])
     text_rect = output_text.get_rect(center=(dialog_x + dialog_width//2, dialog_y + 70))
     screen.blit(output_text, text_rect)
     
     # Instruction text
-    instruction = font.render("Press 'R' to restart or 'ESC' to quit", True, TEXT_COLOR)
+    instruction = render_text(font, "Press 'R' to restart or 'ESC' to quit", TEXT_COLOR)
     inst_rect = instruction.get_rect(center=(dialog_x + dialog_width//2, dialog_y + 130))
     screen.blit(instruction, inst_rect)
-
-# AI Player with Alpha-Beta Pruning
-def evaluate_board(player):
-    """Evaluate the current board state for the given player"""
-    # Simple heuristic: calculate shortest path length
-    if player == 0:  # Red player (top to bottom)
-        return -shortest_path_length(0)  # Negative because shorter is better
-    else:  # Blue player (left to right)
-        return -shortest_path_length(1)  # Negative because shorter is better
-
-def shortest_path_length(player):
-    """Calculate the shortest path length for a player"""
-    if player == 0:  # Red (top to bottom)
-        start_points = [(0, col) for col in range(COLS)]
-        end_points = [(ROWS-1, col) for col in range(COLS)]
-    else:  # Blue (left to right)
-        start_points = [(row, 0) for row in range(ROWS)]
-        end_points = [(row, COLS-1) for row in range(ROWS)]
-    
-    # Create graph with hex cells as nodes
-    graph = defaultdict(list)
     
-    # Add edges between hexes
-    for row in range(ROWS):
-        for col in range(COLS):
-            if (row, col) in hex_states and hex_states[(row, col)] != PLAYER_COLORS[player]:
-                continue  # Skip opponent's hexes and obstacles
-            for nr, nc in get_neighbors(row, col):
-                if (nr, nc) in obstacles:
-                    continue
-                if (nr, nc) in hex_states and hex_states[(nr, nc)] != PLAYER_COLORS[player]:
-                    continue
-                # Weight: 0 for player's cells, 1 for empty cells
-                weight = 0 if (row, col) in hex_states and hex_states[(row, col)] == PLAYER_COLORS[player] else 1
-                graph[(row, col)].append(((nr, nc), weight))
-    
-    # Find shortest path using Dijkstra's algorithm
-    min_dist = float('inf')
-    
-    for start in start_points:
-        if start in obstacles or (start in hex_states and hex_states[start] != PLAYER_COLORS[player]):
-            continue
-            
-        # Distances dict
-        distances = {node: float('inf') for node in graph}
-        distances[start] = 0
-        priority_queue = [(0, start)]
-        
-        while priority_queue:
-            current_dist, current_node = heapq.heappop(priority_queue)
-            
-            if current_dist > distances[current_node]:
-                continue
-                
-            for neighbor, weight in graph[current_node]:
-                distance = current_dist + weight
-                if distance < distances.get(neighbor, float('inf')):
-                    distances[neighbor] = distance
-                    heapq.heappush(priority_queue, (distance, neighbor))
-        
-        # Check all end points
-        for end in end_points:
-            if end in distances and distances[end] < min_dist:
-                min_dist = distances[end]
-    
-    return min_dist if min_dist != float('inf') else 1000  # Large value if no path
+    return pygame.Rect(dialog_x, dialog_y, dialog_width + 5, dialog_height + 5)
 
-def get_valid_moves():
-    """Get all valid moves on the board"""
-    valid_moves = []
-    for row in range(ROWS):
-        for col in range(COLS):
-            if (row, col) not in hex_states and (row, col) not in obstacles:
-                valid_moves.append((row, col))
-    return valid_moves
-
-def alpha_beta_search(depth, player):
-    """Alpha-Beta pruning to find best move"""
-    def max_value(state, alpha, beta, depth, player):
-        if depth == 0:
-            return evaluate_board(player), None
-        
-        v = float('-inf')
-        move = None
-        for r, c in get_valid_moves():
-            # Make move
-            hex_states[(r, c)] = PLAYER_COLORS[player]
-            
-            # Get value
-            v2, _ = min_value(state, alpha, beta, depth - 1, player)
-            
-            # Undo move
-            del hex_states[(r, c)]
-            
-            if v2 > v:
-                v = v2
-                move = (r, c)
-            
-            if v >= beta:
-                return v, move
-            
-            alpha = max(alpha, v)
-        
-        return v, move
-    
-    def min_value(state, alpha, beta, depth, player):
-        if depth == 0:
-            return evaluate_board(player), None
-        
-        v = float('inf')
-        move = None
-        opponent = 1 - player
-        for r, c in get_valid_moves():
-            # Make move
-            hex_states[(r, c)] = PLAYER_COLORS[opponent]
-            
-            # Get value
-            v2, _ = max_value(state, alpha, beta, depth - 1, player)
-            
-            # Undo move
-            del hex_states[(r, c)]
-            
-            if v2 < v:
-                v = v2
-                move = (r, c)
-            
-            if v <= alpha:
-                return v, move
-            
-            beta = min(beta, v)
-        
-        return v, move
-    
-    # Start alpha-beta search
-    _, move = max_value(hex_states, float('-inf'), float('inf'), depth, player)
-    return move
-
-def ai_make_move():
-    """AI makes a move using alpha-beta pruning"""
-    depth = 4  # Adjust depth based on performance
-    move = alpha_beta_search(depth, AI_PLAYER)
-    
-    if move:
-        hex_states[move] = PLAYER_COLORS[AI_PLAYER]
-        return True
-    return False
-
-# Randomly place obstacles
-NUM_OBSTACLES = min(8, int(ROWS * COLS * 0.05))  # Adjust based on board size
-all_positions = [(r, c) for r in range(ROWS) for c in range(COLS)]
-# Skip edges for obstacles to ensure players can make connections
-edge_positions = set()
-for r in range(ROWS):
-    edge_positions.add((r, 0))
-    edge_positions.add((r, COLS-1))
-for c in range(COLS):
-    edge_positions.add((0, c))
-    edge_positions.add((ROWS-1, c))
-valid_obstacle_positions = [pos for pos in all_positions if pos not in edge_positions]
-obstacles = set(random.sample(valid_obstacle_positions, NUM_OBSTACLES))
+# Function to place a stone, recording the game once it is over
+def play_move(move):
+    if state.play(move) and state.game_over and recorder is not None:
+        recorder.append(game_record(state))
+        recorder.flush()
+
+# Function to read the board size and options from the command line
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hex against the AI")
+    parser.add_argument("--size", type=int, help="rows and columns of a square board")
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--cols", type=int, default=COLS)
+    parser.add_argument("--record", help="append finished games to this game record file")
+    args = parser.parse_args()
+    if args.size is not None:
+        args.rows = args.cols = args.size
+    for name in ("rows", "cols"):
+        if not 2 <= getattr(args, name) <= MAX_BOARD_SIZE:
+            parser.error(f"--{name} must be between 2 and {MAX_BOARD_SIZE}")
+    return args
 
 # Main loop
-running = True
-clock = pygame.time.Clock()
+if __name__ == "__main__":
+    args = parse_args()
+    ROWS, COLS = args.rows, args.cols
 
-def restart_game():
-    global hex_states, game_over, winner, TURN, bonus_move_counter, bonus_move_active
-    global bonus_player, move_count
-    
-    hex_states = {}
-    game_over = False
-    winner = None
-    TURN = 0
-    bonus_move_counter = random.randint(1, 5)
-    bonus_move_active = False
-    bonus_player = None
-    move_count = 0
-
-while running:
-    screen.fill(BACKGROUND_COLOR)
-    hex_positions = generate_board()
-    draw_info_panel()
-    
-    # If game is over, draw winner dialog
-    if game_over:
-        draw_winner_dialog()
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-            
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    # Initialize Pygame
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Hex Game Board with Image Obstacles")
+
+    # Game state
+    state = GameState(ROWS, COLS)  # Board, obstacles, turn and bonus move state
+    # AI searches in a background process; HEX_STATS_LOG and HEX_PROFILE opt in to
+    # per-move search statistics (JSON lines) and cProfile output files
+    worker = SearchWorker(stats_log=os.environ.get("HEX_STATS_LOG"),
+                          profile=os.environ.get("HEX_PROFILE"))
+    recorder = RecordWriter(args.record) if args.record else None
+
+    # Font setup
+    font = pygame.font.SysFont("Arial", 24)
+    small_font = pygame.font.SysFont("Arial", 18)
+    large_font = pygame.font.SysFont("Arial", 36)
+
+    # Load obstacle image; build_render_cache() scales it to the hexagons
+    obstacle_img = load_obstacle_image()
+
+    running = True
+    clock = pygame.time.Clock()
+    build_render_cache()
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-            elif event.key == pygame.K_r:
-                restart_game()
-                # Regenerate obstacles
-                obstacles = set(random.sample(valid_obstacle_positions, NUM_OBSTACLES))
-
-        if not game_over and event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            if TURN != AI_PLAYER or bonus_move_active and bonus_player != AI_PLAYER:
-                clicked_hex = get_clicked_hex(pygame.mouse.get_pos(), hex_positions)
-                if clicked_hex and clicked_hex not in hex_states and clicked_hex not in obstacles:
-                    current_player = bonus_player if bonus_move_active else TURN
-                    hex_states[clicked_hex] = PLAYER_COLORS[current_player]
-                    
-                    # Check for win
-                    winner = check_win()
-                    if winner is not None:
-                        game_over = True
-                    elif check_draw():
-                        game_over = True
-                        winner = None  # Draw condition
-                    else:
-                        # Handle bonus move logic
-                        if bonus_move_active:
-                            bonus_move_counter = random.randint(1, 5)
-                            bonus_move_active = False
-                            TURN = 1 - bonus_player  # Next turn after bonus
-                        else:
-                            move_count += 1
-                            # Check if it's time for a bonus move
-                            if move_count % bonus_move_counter == 0:
-                                bonus_move_active = True
-                                bonus_player = TURN  # Current player gets a bonus
-                            else:
-                                TURN = 1 - TURN  # Switch turn
-    
-    # AI's turn
-    if not game_over and (TURN == AI_PLAYER and not bonus_move_active or 
-                         bonus_move_active and bonus_player == AI_PLAYER):
-        ai_made_move = ai_make_move()
+
+            if event.type == pygame.VIDEORESIZE:
+                WIDTH, HEIGHT = event.size
+                screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+                build_render_cache()
+                
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_r:
+                    # Restart with a new obstacle layout
+                    state.restart()
+                    worker.new_game()  # Also cancels an in-flight search
+                    build_render_cache()
+
+            if not state.game_over and event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if state.current_player() != AI_PLAYER:
+                    clicked_hex = get_clicked_hex(pygame.mouse.get_pos())
+                    if clicked_hex:
+                        play_move(clicked_hex)
         
-        if ai_made_move:
-            # Check for win
-            winner = check_win()
-            if winner is not None:
-                game_over = True
-            elif check_draw():
-                game_over = True
-                winner = None  # Draw condition
-            else:
-                # Handle bonus move logic
-                if bonus_move_active:
-                    bonus_move_counter = random.randint(1, 5)
-                    bonus_move_active = False
-                    TURN = 1 - bonus_player  # Next turn after bonus
-                else:
-                    move_count += 1
-                    # Check if it's time for a bonus move
-                    if move_count % bonus_move_counter == 0:
-                        bonus_move_active = True
-                        bonus_player = TURN  # Current player gets a bonus
-                    else:
-                        TURN = 1 - TURN  # Switch turn
-    
-    pygame.display.flip()
-    clock.tick(60)  # Cap at 60 FPS
+        # AI's turn: start a search, then keep drawing until it answers
+        if not state.game_over and state.current_player() == AI_PLAYER:
+            if not worker.busy:
+                worker.submit(state, AI_PLAYER)
+            move = worker.poll()
+            if move is not None:
+                play_move(move)
+        
+        render_frame()
+        clock.tick(60)  # Cap at 60 FPS
 
-pygame.quit()
-sys.exit()
\ No newline at end of file
+    worker.close()
+    if recorder is not None:
+        recorder.close()
+    pygame.quit()
+    sys.exit()
\ No newline at end of file
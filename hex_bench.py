@@ -0,0 +1,240 @@
+"""Headless benchmarks for the Hex AI: engine matches and hot-path timings.
+
+    python hex_bench.py match --a alphabeta:depth=2 --b alphabeta:depth=4 --games 40
+    python hex_bench.py match --games 1000 --record games.hexrec
+    python hex_bench.py micro --json base.json
+    python hex_bench.py micro --compare base.json
+
+A match plays engine A against engine B without pygame, spread over a
+process pool. Games come in pairs with the same obstacles and bonus
+draws and the colors swapped, so neither side profits from a lucky
+layout. It reports A's score with a 95% Wilson interval and the Elo
+difference it implies, plus per-move latency (mean and p95) and search
+speed in nodes per second for each engine. Nodes are the engine's own
+final count (Engine.last_nodes), and the speed only counts the time of
+moves that searched: book moves and MCTS playouts are left out. With --record every game is
+appended to a game record file (see hex_records).
+
+The micro suite times shortest_path_length, check_win, get_valid_moves
+and alpha_beta_search on fixed positions, pytest-benchmark style, and
+can save the results and compare a later run against them.
+
+Engine specs are a name with optional key=value settings passed to
+Engine: "alphabeta:depth=3", "alphabeta:time_ms=200",
+"alphabeta:depth=2,evaluator=resistance", "mcts:playouts=2000" or "random".
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import statistics
+import sys
+import time
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+
+from hex_engine import (RED, BLUE, Engine, GameState, alpha_beta_search,
+                        random_obstacles, shortest_path_length)
+from hex_parallel import benchmark_position
+from hex_records import RecordWriter, game_record
+
+Z95 = 1.96  # Normal quantile for a 95% interval
+
+
+class Player:
+    """An engine spec turned into something that picks moves and counts nodes"""
+
+    def __init__(self, spec, seed):
+        name, _, options = spec.partition(":")
+        self.rng = random.Random(seed)
+        self.engine = None
+        if name != "random":
+            settings = {}
+            for option in filter(None, options.split(",")):
+                key, _, value = option.partition("=")
+                settings[key] = int(value) if value.isdigit() else value
+            self.engine = Engine(algorithm=name, **settings)
+        self.nodes = 0
+        self.search_seconds = 0.0  # Time of the moves that searched nodes
+
+    def choose(self, state):
+        if self.engine is None:
+            return self.rng.choice(state.get_valid_moves())
+        start = time.perf_counter()
+        move = self.engine.choose_move(state)
+        if self.engine.last_nodes:
+            self.nodes += self.engine.last_nodes
+            self.search_seconds += time.perf_counter() - start
+        return move
+
+
+# Function to play one game of a match; runs in a pool process
+def play_game(job):
+    a_spec, b_spec, size, obstacles, seed, a_is_red = job
+    rng = random.Random(seed)
+    state = GameState(size, size, random_obstacles(size, size, rng, obstacles), seed=seed)
+    a, b = Player(a_spec, seed), Player(b_spec, seed + 1)
+    players = {RED: a, BLUE: b} if a_is_red else {RED: b, BLUE: a}
+    latencies = {a: [], b: []}
+    while not state.game_over:
+        player = players[state.current_player()]
+        start = time.perf_counter()
+        move = player.choose(state)
+        latencies[player].append(time.perf_counter() - start)
+        if move is None or not state.play(move):
+            break
+    if state.winner is None:
+        result = 0.5
+    else:
+        result = 1.0 if players[state.winner] is a else 0.0
+    return {"score": result, "red_won": state.winner == RED,
+            "a_times": latencies[a], "b_times": latencies[b],
+            "a_nodes": a.nodes, "b_nodes": b.nodes, "a_search_seconds": a.search_seconds,
+            "b_search_seconds": b.search_seconds, "record": game_record(state)}
+
+
+# Function to get a 95% Wilson score interval
+def wilson_interval(score, n, z=Z95):
+    if n == 0:
+        return 0.0, 1.0
+    center = (score + z * z / (2 * n)) / (1 + z * z / n)
+    spread = z * math.sqrt(score * (1 - score) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, center - spread), min(1.0, center + spread)
+
+# Function to turn an expected score into an Elo difference
+def elo(score):
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+    return -400 * math.log10(1 / score - 1)
+
+# Function to get a nearest-rank percentile
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def run_match(args):
+    jobs = []
+    for i in range(args.games):
+        seed = args.seed + i // 2  # Each seed is played twice, colors swapped
+        jobs.append((args.a, args.b, args.size, args.obstacles, seed, i % 2 == 0))
+    start = time.perf_counter()
+    if args.jobs == 1:
+        results = [play_game(job) for job in jobs]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(args.jobs, mp_context=ctx) as pool:
+            results = list(pool.map(play_game, jobs))
+    elapsed = time.perf_counter() - start
+    if args.record:
+        writer = RecordWriter(args.record)
+        for r in results:
+            writer.append(r["record"])
+        writer.close()
+
+    n = len(results)
+    total = sum(r["score"] for r in results)
+    wins = sum(r["score"] == 1 for r in results)
+    draws = sum(r["score"] == 0.5 for r in results)
+    score = total / n
+    low, high = wilson_interval(score, n)
+    print(f"{n} games on {args.size}x{args.size}, {args.obstacles} obstacles, "
+          f"{elapsed:.1f}s wall ({args.jobs} jobs)")
+    print(f"A {args.a} vs B {args.b}: +{wins} ={draws} -{n - wins - draws}")
+    print(f"  A score {score:.3f} (95% CI {low:.3f}-{high:.3f}), "
+          f"Elo {elo(score):+.0f} ({elo(low):+.0f} to {elo(high):+.0f})")
+    print(f"  Red won {sum(r['red_won'] for r in results)} of {n}")
+    for label, spec in (("a", args.a), ("b", args.b)):
+        times = [t for r in results for t in r[label + "_times"]]
+        nodes = sum(r[label + "_nodes"] for r in results)
+        if not times:
+            continue
+        line = (f"  {label.upper()} {spec}: {len(times)} moves, mean {statistics.mean(times) * 1000:.1f} ms, "
+                f"p95 {percentile(times, 0.95) * 1000:.1f} ms")
+        if nodes:
+            seconds = sum(r[label + "_search_seconds"] for r in results)
+            line += f", {nodes / seconds:,.0f} nodes/s"
+        print(line)
+
+
+# Function to list the micro benchmarks as (name, callable)
+def micro_cases(depth):
+    cases = []
+    for size, stones in ((8, 12), (11, 20)):
+        state = benchmark_position(size, stones, seed=1)
+        board = state.board
+        player = state.current_player()
+        cases += [
+            (f"shortest_path_length {size}x{size}", lambda b=board: shortest_path_length(b, RED)),
+            (f"check_win {size}x{size}", state.check_win),
+            (f"get_valid_moves {size}x{size}", state.get_valid_moves),
+            (f"alpha_beta_search {size}x{size} d{depth - 1}",
+             lambda s=state, p=player: alpha_beta_search(s, depth - 1, p)),
+        ]
+        if size == 8:
+            cases.append((f"alpha_beta_search {size}x{size} d{depth}",
+                          lambda s=state, p=player: alpha_beta_search(s, depth, p)))
+    return cases
+
+def run_micro(args):
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    results = {}
+    regressions = 0
+    print(f"{'name':34s} {'min':>10s} {'mean':>10s} {'stddev':>10s} {'ops/s':>10s}")
+    for name, fn in micro_cases(args.depth):
+        if args.filter and args.filter not in name:
+            continue
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        runs = [t / number for t in timer.repeat(args.rounds, number)]
+        mean = statistics.mean(runs)
+        results[name] = mean
+        line = (f"{name:34s} {min(runs) * 1e6:8.1f}us {mean * 1e6:8.1f}us "
+                f"{statistics.pstdev(runs) * 1e6:8.1f}us {1 / mean:10,.0f}")
+        if name in baseline:
+            change = mean / baseline[name] - 1
+            line += f"  {change:+.1%}"
+            if change > args.threshold:
+                line += " REGRESSION"
+                regressions += 1
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Hex AI benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    match = commands.add_parser("match", help="engine vs engine games")
+    match.add_argument("--a", default="alphabeta:depth=2", help="engine spec for A")
+    match.add_argument("--b", default="random", help="engine spec for B")
+    match.add_argument("--games", type=int, default=20)
+    match.add_argument("--size", type=int, default=8)
+    match.add_argument("--obstacles", type=int, default=3)
+    match.add_argument("--seed", type=int, default=1)
+    match.add_argument("--jobs", type=int, default=multiprocessing.cpu_count())
+    match.add_argument("--record", help="append the games to this game record file")
+
+    micro = commands.add_parser("micro", help="hot path timings on fixed positions")
+    micro.add_argument("--depth", type=int, default=3, help="deepest alpha_beta_search timed")
+    micro.add_argument("--rounds", type=int, default=5)
+    micro.add_argument("--filter", help="only run benchmarks whose name contains this")
+    micro.add_argument("--json", help="save mean times to this file")
+    micro.add_argument("--compare", help="compare with times saved by --json")
+    micro.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression")
+
+    args = parser.parse_args()
+    if args.command == "match":
+        run_match(args)
+    else:
+        sys.exit(run_micro(args))
+
+if __name__ == "__main__":
+    main()
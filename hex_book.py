@@ -0,0 +1,229 @@
+"""Opening book: best replies for early positions, searched offline.
+
+    python hex_book.py --size 8 --seeds 1 2 3 --stones 1 --depth 5
+    python hex_book.py --size 8 --no-obstacles --out hex_book.bin --merge
+
+The builder walks every position with at most --stones stones, for each
+obstacle layout asked for: the layout a GameState draws from each seed
+and/or the empty layout. Every schedule the bonus-move rule can produce
+is included, since the counter is random. Each position is searched to
+--depth across a process pool, and its best move is written to the book.
+
+Positions are keyed by their Zobrist hash (stones, obstacles, player to
+move and bonus-move schedule). When the board has an even number of
+columns, a position and its 180 degree rotation are the same for both
+players, so only the smaller of the two keys is stored, together with
+the move in that orientation.
+
+The file is a 16-byte header (b"HEXBOOK", a version byte, then the entry
+count as a little-endian uint64), the sorted keys as uint64 and the
+moves as uint16 cell indices. OpeningBook memory-maps it and
+binary-searches the keys in place, so opening it costs nothing and a
+lookup takes microseconds.
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from hex_engine import (GameState, TranspositionTable, game_schedule,
+                        iter_bits, iterative_deepening, schedule_key)
+
+MAGIC = b"HEXBOOK"
+VERSION = 1
+HEADER = struct.Struct("<7sBQ")
+
+
+# Function to check if turning a board 180 degrees keeps every neighbor pair
+@lru_cache(maxsize=None)
+def has_rotation(geometry):
+    last = geometry.size - 1
+    return all(geometry.neighbor_masks[last - i] == sum(1 << (last - n) for n in nbrs)
+               for i, nbrs in enumerate(geometry.neighbors))
+
+def position_keys(state):
+    """(key, key of the rotated position or None) for the player to move"""
+    board = state.board
+    geometry = board.geometry
+    schedule = game_schedule(state)
+    extra = schedule_key(geometry, schedule) ^ geometry.side_keys[state.current_player()]
+    if not has_rotation(geometry):
+        return board.hash ^ extra, None
+    last = geometry.size - 1
+    rotated = extra
+    for i in iter_bits(board.obstacle_mask):
+        rotated ^= geometry.obstacle_keys[last - i]
+    for player in (0, 1):
+        keys = geometry.stone_keys[player]
+        for i in iter_bits(board.stones[player]):
+            rotated ^= keys[last - i]
+    return board.hash ^ extra, rotated
+
+def book_entry(state, move):
+    """(stored key, stored cell index) of a position's move"""
+    key, rotated = position_keys(state)
+    index = state.board.index(*move)
+    if rotated is not None and rotated < key:
+        return rotated, state.board.geometry.size - 1 - index
+    return key, index
+
+
+class OpeningBook:
+    """Read-only view of a book file, memory-mapped"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.count = count
+        keys_end = HEADER.size + 8 * count
+        view = memoryview(self.data)
+        if sys.byteorder == "little":
+            self.keys = view[HEADER.size:keys_end].cast("Q")
+            self.moves = view[keys_end:keys_end + 2 * count].cast("H")
+        else:
+            # The file is little-endian; big-endian hosts read a swapped copy
+            self.keys = array("Q")
+            self.keys.frombytes(view[HEADER.size:keys_end])
+            self.moves = array("H")
+            self.moves.frombytes(view[keys_end:keys_end + 2 * count])
+            self.keys.byteswap()
+            self.moves.byteswap()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+            self.moves.release()
+        self.data.close()
+
+    def find(self, key):
+        i = bisect_left(self.keys, key)
+        if i < self.count and self.keys[i] == key:
+            return self.moves[i]
+        return None
+
+    def lookup(self, state):
+        """Book move (row, col) for the player to move, or None"""
+        key, rotated = position_keys(state)
+        board = state.board
+        index = self.find(key)
+        if index is None and rotated is not None:
+            index = self.find(rotated)
+            if index is not None:
+                index = board.geometry.size - 1 - index
+        if index is None or not board.empty_mask() >> index & 1:
+            return None
+        return board.cell(index)
+
+
+# Function to write a book file from a {key: cell index} dict
+def write_book(path, entries):
+    keys = array("Q", sorted(entries))
+    moves = array("H", (entries[k] for k in keys))
+    if sys.byteorder != "little":
+        keys.byteswap()
+        moves.byteswap()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys)))
+        keys.tofile(f)
+        moves.tofile(f)
+
+# Function to read all entries of a book file into a dict
+def read_book(path):
+    book = OpeningBook(path)
+    entries = dict(zip(book.keys, book.moves))
+    book.close()
+    return entries
+
+def book_positions(size, obstacles, max_stones):
+    """Every position with at most max_stones stones, one state per book key"""
+    starts = []
+    for counter in range(1, 6):  # The first bonus counter is randint(1, 5)
+        state = GameState(size, size, obstacles)
+        state.bonus_move_counter = counter
+        starts.append(state)
+    seen = set()
+    positions = []
+    frontier = starts
+    for stones in range(max_stones + 1):
+        following = []
+        for state in frontier:
+            key = min(k for k in position_keys(state) if k is not None)
+            if key in seen:
+                continue
+            seen.add(key)
+            positions.append(state)
+            if stones == max_stones:
+                continue
+            for move in state.get_valid_moves():
+                bonus = state.bonus_move_active
+                child = state.copy()
+                child.play(move)
+                if child.game_over:
+                    continue
+                if not bonus:
+                    following.append(child)
+                    continue
+                for counter in range(1, 6):  # Every redraw after the bonus move
+                    redrawn = child.copy()
+                    redrawn.bonus_move_counter = counter
+                    following.append(redrawn)
+        frontier = following
+    return positions
+
+# Function to search one book position; runs in a pool process
+def search_position(job):
+    state, depth, tt_mb = job
+    move = iterative_deepening(state, state.current_player(), max_depth=depth,
+                               tt=TranspositionTable(tt_mb))
+    return book_entry(state, move)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a Hex opening book")
+    parser.add_argument("--size", type=int, default=8, help="rows and columns")
+    parser.add_argument("--seeds", type=int, nargs="*", default=[],
+                        help="obstacle layouts drawn by GameState(seed=...)")
+    parser.add_argument("--no-obstacles", action="store_true", help="also the empty layout")
+    parser.add_argument("--stones", type=int, default=1, help="deepest position, in stones")
+    parser.add_argument("--depth", type=int, default=5, help="search depth per position")
+    parser.add_argument("--tt-mb", type=int, default=16)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "hex_book.bin"))
+    parser.add_argument("--merge", action="store_true", help="keep the entries already in --out")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    layouts = [GameState(args.size, args.size, seed=seed).obstacles for seed in args.seeds]
+    if args.no_obstacles or not layouts:
+        layouts.append(set())
+    jobs = []
+    for obstacles in layouts:
+        jobs += [(state, args.depth, args.tt_mb)
+                 for state in book_positions(args.size, obstacles, args.stones)]
+    print(f"{len(jobs)} positions in {len(layouts)} layouts, depth {args.depth}")
+
+    entries = read_book(args.out) if args.merge and os.path.exists(args.out) else {}
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.jobs, mp_context=ctx) as pool:
+        for done, (key, index) in enumerate(pool.map(search_position, jobs, chunksize=4), 1):
+            entries[key] = index
+            if done % 50 == 0:
+                print(f"  {done}/{len(jobs)} {time.perf_counter() - start:.0f}s", flush=True)
+    write_book(args.out, entries)
+    print(f"wrote {len(entries)} entries to {args.out} in {time.perf_counter() - start:.0f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""Brute-force checks of the engine's fast paths.
+
+    python hex_checks.py                    # run every check
+    python hex_checks.py unionfind --trials 50 --seed 3
+
+Each check builds random positions on small boards and compares an
+incremental structure or a pruned search with a slow, plainly correct
+version of the same thing. Every mismatch is printed, and the exit
+status is 1 if there was any, so the checks can guard later changes.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from collections import deque
+
+from hex_engine import (FORCED_SCORE, MAX_BOARD_SIZE, AlphaBeta, DistanceTracker, Engine, GameState,
+                        TranspositionTable, captured_cells, dead_cells, distance_map, evaluate_board,
+                        game_schedule, iter_bits, next_schedule, random_obstacles, schedule_mover,
+                        virtual_connection)
+
+
+# Function to play random moves from a fresh game on a small board
+def random_position(rng, rows, cols, moves, obstacles=0):
+    cells = [(r, c) for r in range(1, rows - 1) for c in range(1, cols - 1)]
+    state = GameState(rows, cols, obstacles=rng.sample(cells, min(obstacles, len(cells))),
+                      seed=rng.getrandbits(32))
+    for _ in range(moves):
+        if state.game_over:
+            break
+        state.play(rng.choice(state.get_valid_moves()))
+    return state
+
+def bfs_connected(board, player):
+    """True if the player's stones join their edges, by a flood fill from scratch"""
+    geometry = board.geometry
+    stones = board.stones[player]
+    reached = stones & geometry.start_masks[player]
+    queue = deque(iter_bits(reached))
+    while queue:
+        c = queue.popleft()
+        for n in geometry.neighbors[c]:
+            if stones >> n & 1 and not reached >> n & 1:
+                reached |= 1 << n
+                queue.append(n)
+    return bool(reached & geometry.end_masks[player])
+
+
+def check_unionfind(rng, trials):
+    """Rollback union-find against a flood fill, through make and unmake"""
+    mismatches = []
+    for trial in range(trials):
+        rows, cols = rng.randint(2, 7), rng.randint(2, 7)
+        board = random_position(rng, rows, cols, 0, rng.randint(0, 2)).board
+        placed = []
+        for step in range(4 * rows * cols):
+            empty = board.empty_mask()
+            if empty and (not placed or rng.random() < 0.6):
+                m = rng.choice(list(iter_bits(empty)))
+                p = rng.randint(0, 1)
+                board.make(m, p)
+                placed.append((m, p))
+            elif placed:
+                board.unmake(*placed.pop())
+            for p in (0, 1):
+                if board.is_connected(p) != bfs_connected(board, p):
+                    mismatches.append(f"{rows}x{cols} trial {trial} step {step} player {p}")
+    return trials, mismatches
+
+def check_tracker(rng, trials):
+    """Incrementally repaired distance maps against a fresh 0-1 BFS, through make and unmake"""
+    mismatches = []
+    for trial in range(trials):
+        rows, cols = rng.randint(2, 8), rng.randint(2, 8)
+        state = random_position(rng, rows, cols, rng.randint(0, rows * cols // 3), rng.randint(0, 3))
+        board = state.board.copy()
+        tracker = DistanceTracker(board)
+        placed = []
+        for step in range(3 * rows * cols):
+            empty = board.empty_mask()
+            if empty and (not placed or rng.random() < 0.6):
+                m = rng.choice(list(iter_bits(empty)))
+                p = rng.randint(0, 1)
+                board.make(m, p)
+                tracker.make(m, p)
+                placed.append((m, p))
+            elif placed:
+                m, p = placed.pop()
+                board.unmake(m, p)
+                tracker.unmake(m, p)
+            for p in (0, 1):
+                if tracker.dist[p] != distance_map(board, p):
+                    mismatches.append(f"{rows}x{cols} trial {trial} step {step} player {p}")
+    return trials, mismatches
+
+def check_parallel(rng, trials):
+    """Parallel root search against the serial search at the same depth"""
+    from hex_parallel import ParallelSearch  # Imported lazily, it starts processes
+    checked = 0
+    mismatches = []
+    searcher = ParallelSearch(2)
+    try:
+        for trial in range(trials):
+            size = rng.choice([4, 5, 6])
+            state = random_position(rng, size, size, rng.randint(0, size), rng.randint(0, 2))
+            if state.game_over:
+                continue
+            player = state.current_player()
+            depth = rng.choice([2, 3])
+            value, pv = AlphaBeta(state, player).search(depth)
+            serial = state.board.cell(pv[0]) if pv else None
+            parallel, parallel_value = searcher.search(state, depth, player)
+            checked += 1
+            if (parallel, parallel_value) != (serial, value):
+                mismatches.append(f"{size}x{size} trial {trial} depth {depth}: serial {serial} "
+                                  f"{value}, parallel {parallel} {parallel_value}")
+    finally:
+        searcher.close()
+    return checked, mismatches
+
+def expectimax(search, depth, schedule):
+    """Value of the position in search for its player, by full expectiminimax
+
+    Every empty cell is tried, each of the five counter redraws is its
+    own outcome, and leaves are evaluated from scratch. Wins are scored
+    by the search's win_value, so only the pruning is being compared.
+    """
+    board = search.board
+    if depth == 0:
+        return evaluate_board(board, search.player)
+    moves = list(iter_bits(board.empty_mask()))
+    if not moves:
+        return 0
+    mover = schedule_mover(schedule)
+    values = []
+    for m in moves:
+        search.make(m, mover)
+        values.append(expectimax_after(search, mover, depth, schedule))
+        search.unmake(m, mover)
+    return max(values) if mover == search.player else min(values)
+
+def expectimax_after(search, mover, depth, schedule):
+    """Value once mover has moved at a node of the given depth and schedule"""
+    value = search.win_value(mover, depth, schedule)
+    if value is not None:
+        return value
+    if schedule[1]:
+        move_count = schedule[4]
+        return sum(expectimax(search, depth - 1,
+                              (1 - mover, False, None, counter - move_count % counter, move_count))
+                   for counter in range(1, 6)) / 5
+    return expectimax(search, depth - 1, next_schedule(schedule))
+
+# Function to pick an alpha-beta window that fails low, fails high or holds the value
+def random_window(rng, value):
+    bounds = [value + offset for offset in (-3, -1, -0.5, 0, 0.5, 1, 3)]
+    alpha, beta = sorted(rng.sample(bounds + [float('-inf'), float('inf')], 2))
+    return alpha, beta
+
+def window_error(value, expected, alpha, beta):
+    """What is wrong with a fail-soft result for the window, or None"""
+    if expected <= alpha:
+        return None if value <= alpha + 1e-6 else "should fail low"
+    if expected >= beta:
+        return None if value >= beta - 1e-6 else "should fail high"
+    return None if abs(value - expected) <= 1e-6 else "should be exact"
+
+def exact_search(state, player, tt=None):
+    """AlphaBeta without the inferior-cell analysis
+
+    Pruning dead and captured cells keeps the result of the game but
+    not always a depth-limited value, so it has its own check.
+    """
+    search = AlphaBeta(state, player, tt)
+    search.INFERIOR_DEPTH = float('inf')
+    return search
+
+def check_expectimax(rng, trials):
+    """Alpha-Beta with chance nodes, Star1/Star2 and the TT against full expectiminimax
+
+    Besides the root value, every root move is searched again with
+    random windows, which the chance nodes narrow for their outcomes.
+    """
+    checked = 0
+    mismatches = []
+    for trial in range(trials):
+        size = rng.choice([4, 5])
+        state = random_position(rng, size, size, rng.randint(0, size * size - 6))
+        # Mostly positions where a bonus move falls within the search
+        while (not state.game_over and not state.bonus_move_active
+               and state.moves_until_bonus() > 2 and rng.random() < 0.8):
+            state.play(rng.choice(state.get_valid_moves()))
+        if state.game_over:
+            continue
+        player = state.current_player()
+        empty = bin(state.board.empty_mask()).count("1")
+        depth = rng.choice([3, 4, 5] if empty <= 9 else [2, 3, 4] if empty <= 16 else [2, 3])
+        schedule = game_schedule(state)
+        where = f"{size}x{size} trial {trial} depth {depth}"
+
+        reference = AlphaBeta(state, player)
+        children = {}
+        for m in iter_bits(state.board.empty_mask()):
+            reference.make(m, player)
+            children[m] = expectimax_after(reference, player, depth, schedule)
+            reference.unmake(m, player)
+        expected = max(children.values())
+        for tt in (None, TranspositionTable(4)):
+            value, _ = exact_search(state, player, tt).search(depth)
+            checked += 1
+            if abs(value - expected) > 1e-6:
+                mismatches.append(f"{where} {'with' if tt else 'without'} TT: {value}, "
+                                  f"expected {expected}")
+
+        search = exact_search(state, player, TranspositionTable(4))
+        search.depth = depth
+        for m, expected in children.items():
+            search.make(m, player)
+            if search.win_value(player, depth, schedule) is None:
+                for _ in range(2):
+                    alpha, beta = random_window(rng, expected)
+                    value, _ = search.after_move(alpha, beta, depth - 1, 1, schedule)
+                    checked += 1
+                    error = window_error(value, expected, alpha, beta)
+                    if error:
+                        mismatches.append(f"{where} move {state.board.cell(m)} window "
+                                          f"({alpha}, {beta}): {value} {error}, expected {expected}")
+            search.unmake(m, player)
+    return checked, mismatches
+
+
+def alternating_value(board, mover, memo):
+    """1, 0 or -1 for mover winning, drawing or losing with strict alternation"""
+    key = (board.stones[0], board.stones[1], mover)
+    if key in memo:
+        return memo[key]
+    best = 0 if not board.empty_mask() else -1
+    for m in iter_bits(board.empty_mask()):
+        board.make(m, mover)
+        value = 1 if board.is_connected(mover) else -alternating_value(board, 1 - mover, memo)
+        board.unmake(m, mover)
+        best = max(best, value)
+        if best == 1:
+            break
+    memo[key] = best
+    return best
+
+def forced_win(board, player, schedule, memo):
+    """True if player wins whatever the opponent plays and the bonus draws are"""
+    key = (board.stones[0], board.stones[1], schedule)
+    if key in memo:
+        return memo[key]
+    mover = schedule_mover(schedule)
+    result = False if not board.empty_mask() else mover != player
+    for m in iter_bits(board.empty_mask()):
+        board.make(m, mover)
+        won = forced_win_after(board, mover, player, schedule, memo)
+        board.unmake(m, mover)
+        if won == (mover == player):
+            result = won
+            break
+    memo[key] = result
+    return result
+
+def forced_win_after(board, mover, player, schedule, memo):
+    """forced_win once mover has placed a stone under schedule"""
+    if board.is_connected(mover):
+        return mover == player
+    if schedule[1]:
+        move_count = schedule[4]
+        return all(forced_win(board, player, (1 - mover, False, None,
+                                              counter - move_count % counter, move_count), memo)
+                   for counter in range(1, 6))
+    return forced_win(board, player, next_schedule(schedule), memo)
+
+# Function to find the winner once the given empty cells are filled with the given players
+def filled_winner(board, cells, players):
+    board = board.copy()
+    for c, p in zip(cells, players):
+        board.make(c, p)
+    return 0 if board.is_connected(0) else 1 if board.is_connected(1) else None
+
+def check_inferior(rng, trials):
+    """Dead cells, captured cells, virtual connections and the search's
+    forced results against exhaustively played out games
+
+    A dead cell's color never changes the winner of any filling of the
+    board. Filling a player's captured cells for them, or a virtual
+    connection with the opponent to move, keeps the result of the game.
+    A win or loss the search proves holds whatever the bonus draws are.
+    """
+    checked = 0
+    mismatches = []
+    for trial in range(trials):
+        rows, cols = rng.choice([(3, 3), (3, 4), (4, 3), (4, 4), (4, 5), (5, 4), (5, 5)])
+        state = random_position(rng, rows, cols, rng.randint(2, rows * cols - 4), rng.randint(0, 2))
+        board = state.board
+        empty = list(iter_bits(board.empty_mask()))
+        if state.game_over or len(empty) > 11:
+            continue
+        where = f"{rows}x{cols} trial {trial}"
+        checked += 1
+        for d in iter_bits(dead_cells(board)):
+            rest = [c for c in empty if c != d]
+            for k in range(1 << len(rest)):
+                players = [k >> i & 1 for i in range(len(rest))]
+                if filled_winner(board, rest + [d], players + [0]) != filled_winner(board, rest + [d], players + [1]):
+                    mismatches.append(f"{where}: dead cell {board.cell(d)} decides a filling")
+                    break
+        memo = {}
+        for player in (0, 1):
+            links = virtual_connection(board, player)
+            if links is not None and alternating_value(board, 1 - player, memo) != -1:
+                mismatches.append(f"{where}: virtual connection of {player} ({links} links) is cut")
+            captured = captured_cells(board, player)
+            if captured:
+                filled = board.copy()
+                for c in iter_bits(captured):
+                    filled.make(c, player)
+                for mover in (0, 1):
+                    if filled.is_connected(player):
+                        value = 1 if mover == player else -1
+                    else:
+                        value = alternating_value(filled, mover, {})
+                    if value != alternating_value(board, mover, memo):
+                        mismatches.append(f"{where}: filling {player}'s captured cells "
+                                          f"{[board.cell(c) for c in iter_bits(captured)]} "
+                                          f"changes the game for mover {mover}")
+        player = state.current_player()
+        value, _ = AlphaBeta(state, player).search(rng.choice([2, 3, 4]))
+        if abs(value) > FORCED_SCORE:
+            winner = player if value > 0 else 1 - player
+            if not forced_win(board.copy(), winner, game_schedule(state), {}):
+                mismatches.append(f"{where}: search proves a {'win' if value > 0 else 'loss'} "
+                                  f"that the bonus draws can spoil")
+    return checked, mismatches
+
+def check_solver(rng, trials):
+    """df-pn endgame results and winning moves against an exhaustive worst-case solve"""
+    from hex_solver import LOSS, NO_FORCED_WIN, WIN, solve_endgame
+    checked = 0
+    mismatches = []
+    for trial in range(trials):
+        size = rng.choice([4, 5, 6])
+        state = random_position(rng, size, size, rng.randint(size * size - 12, size * size - 5),
+                                rng.randint(0, 2))
+        if state.game_over:
+            continue
+        checked += 1
+        player = state.current_player()
+        schedule = game_schedule(state)
+        result, move = solve_endgame(state)
+        board = state.board.copy()
+        if forced_win(board, player, schedule, {}):
+            expected = WIN
+        elif forced_win(board, 1 - player, schedule, {}):
+            expected = LOSS
+        else:
+            expected = NO_FORCED_WIN
+        where = f"{size}x{size} trial {trial}"
+        if result != expected:
+            mismatches.append(f"{where}: solver says {result}, expected {expected}")
+        elif result == WIN:
+            board.make(board.index(*move), player)
+            if not forced_win_after(board, player, player, schedule, {}):
+                mismatches.append(f"{where}: winning move {move} lets the win slip")
+    return checked, mismatches
+
+def dense_resistance(np, board, player):
+    """Edge-to-edge resistance of player from one dense nodal system over every cell"""
+    from hex_resistance import LEAK, MIN_CURRENT, STONE_RESISTANCE
+    geometry = board.geometry
+    n = geometry.size
+    r = [math.inf] * n
+    for c in iter_bits(board.empty_mask()):
+        r[c] = 1.0
+    for c in iter_bits(board.stones[player]):
+        r[c] = STONE_RESISTANCE
+    matrix = np.zeros((n, n))
+    to_start = np.zeros(n)
+    for a in range(n):
+        matrix[a, a] = LEAK
+        for b in geometry.neighbors[a]:
+            g = 1 / (r[a] + r[b])
+            matrix[a, b] -= g
+            matrix[a, a] += g
+    for c in geometry.start_cells[player]:
+        to_start[c] = 1 / r[c]
+        matrix[c, c] += 1 / r[c]
+    for c in geometry.end_cells[player]:
+        matrix[c, c] += 1 / r[c]
+    voltage = np.linalg.solve(matrix, to_start)
+    return 1 / max((to_start * (1 - voltage)).sum(), MIN_CURRENT)
+
+def check_resistance(rng, trials):
+    """Block tridiagonal circuit solve against a dense solve, for batches of positions"""
+    import numpy as np  # Imported lazily, only this check needs it
+    from hex_resistance import board_cells, board_circuit
+    checked = 0
+    mismatches = []
+    for trial in range(trials):
+        rows, cols = rng.randint(1, 9), rng.randint(1, 9)
+        states = [random_position(rng, rows, cols, rng.randint(0, rows * cols),
+                                  rng.randint(0, 3)) for _ in range(rng.randint(1, 4))]
+        boards = [state.board for state in states]
+        resist = board_circuit(boards[0].geometry).resistances(
+            np.array([board_cells(board) for board in boards]))
+        for i, board in enumerate(boards):
+            for player in (0, 1):
+                checked += 1
+                expected = dense_resistance(np, board, player)
+                if abs(math.log(resist[i, player] / expected)) > 1e-6:
+                    mismatches.append(f"{rows}x{cols} trial {trial} board {i} player {player}: "
+                                      f"{resist[i, player]:.9g}, expected {expected:.9g}")
+    return checked, mismatches
+
+def check_sizes(rng, trials):
+    """Boards with a side of 2 or 3, which have little or no room for
+    obstacles: setting up a game, the obstacles drawn for it and a
+    search must all work there, with any obstacle count asked for"""
+    sizes = [(short, other) for short in (2, 3) for other in range(2, MAX_BOARD_SIZE + 1)]
+    sizes += [(other, short) for short, other in sizes if other != short]
+    mismatches = []
+    for trial in range(trials):
+        rows, cols = sizes[trial % len(sizes)]
+        where = f"{rows}x{cols} trial {trial}"
+        interior = max(rows - 2, 0) * max(cols - 2, 0)
+        count = rng.randint(0, 8)
+        try:
+            obstacles = random_obstacles(rows, cols, rng, count)
+            state = GameState(rows, cols, seed=rng.getrandbits(32))
+            move = Engine(depth=1, book=None).choose_move(state)
+        except ValueError as error:
+            mismatches.append(f"{where}: {error!r}")
+            continue
+        if len(obstacles) != min(count, interior) or not all(
+                0 < r < rows - 1 and 0 < c < cols - 1 for r, c in obstacles):
+            mismatches.append(f"{where}: obstacles {sorted(obstacles)} for a count of {count}")
+        if move not in state.get_valid_moves():
+            mismatches.append(f"{where}: engine played {move}")
+    return trials, mismatches
+
+
+CHECKS = {  # name -> (check, default trials)
+    "unionfind": (check_unionfind, 200),
+    "tracker": (check_tracker, 200),
+    "parallel": (check_parallel, 24),
+    "expectimax": (check_expectimax, 30),
+    "inferior": (check_inferior, 300),
+    "solver": (check_solver, 60),
+    "resistance": (check_resistance, 200),
+    "sizes": (check_sizes, 92),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Brute-force checks of the Hex engine")
+    parser.add_argument("checks", nargs="*", help=f"checks to run: {', '.join(CHECKS)} (default all)")
+    parser.add_argument("--trials", type=int, help="positions per check (default per check)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check {unknown[0]}")
+
+    failed = False
+    for name in args.checks or CHECKS:
+        check, trials = CHECKS[name]
+        rng = random.Random(f"{name} {args.seed}")
+        start = time.perf_counter()
+        checked, mismatches = check(rng, args.trials or trials)
+        for mismatch in mismatches:
+            print(f"  MISMATCH {mismatch}")
+        print(f"{name}: {checked} checked, {len(mismatches)} mismatches "
+              f"({time.perf_counter() - start:.1f}s)")
+        failed = failed or bool(mismatches)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1741 @@
+"""Headless Hex engine: board state, game rules and the Alpha-Beta AI.
+
+This module has no pygame dependency so it can be imported by batch jobs,
+benchmarks and servers. The pygame front end in hex.py is a thin client
+on top of GameState and Engine.
+"""
+import cProfile
+import json
+import os
+import random
+import time
+import heapq
+from collections import deque
+from functools import lru_cache
+
+# Board Settings
+ROWS, COLS = 8, 8  # Slightly smaller board for better gameplay
+MAX_BOARD_SIZE = 25  # Largest rows or columns the front ends accept
+
+# Players
+RED, BLUE = 0, 1  # Red connects top to bottom, Blue connects left to right
+AI_PLAYER = BLUE  # AI plays as Blue
+
+# Opening book built by hex_book.py, used when present
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hex_book.bin")
+
+# The six neighbor directions, clockwise from straight up (odd columns sit half a hex lower)
+EVEN_COL_DIRECTIONS = [(-1, 0), (-1, 1), (0, 1), (1, 0), (0, -1), (-1, -1)]
+ODD_COL_DIRECTIONS = [(-1, 0), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+
+# Function to get neighboring hex coordinates
+def get_neighbors(row, col, rows=ROWS, cols=COLS):
+    neighbors = []
+    directions = ODD_COL_DIRECTIONS if col % 2 == 1 else EVEN_COL_DIRECTIONS
+
+    for dr, dc in directions:
+        nr, nc = row + dr, col + dc
+        if 0 <= nr < rows and 0 <= nc < cols:
+            neighbors.append((nr, nc))
+
+    return neighbors
+
+# Function to randomly place obstacles
+def random_obstacles(rows, cols, rng=random, count=None):
+    """Pick obstacle hexes away from the board edges; count defaults by board size
+
+    Boards with no interior (two rows or columns) get fewer obstacles, or none.
+    """
+    num_obstacles = min(8, int(rows * cols * 0.05)) if count is None else count  # Adjust based on board size
+    # Skip edges for obstacles to ensure players can make connections
+    valid_obstacle_positions = [(r, c) for r in range(1, rows - 1) for c in range(1, cols - 1)]
+    num_obstacles = min(num_obstacles, len(valid_obstacle_positions))
+    return set(rng.sample(valid_obstacle_positions, num_obstacles))
+
+
+# Function to iterate over the cell indices set in a bitmask
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Geometry:
+    """Per board size tables: neighbor lists and masks, edge masks"""
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.full_mask = (1 << self.size) - 1
+        self.neighbors = []  # cell index -> list of neighbor indices
+        self.neighbor_masks = []  # cell index -> bitmask of neighbors
+        for row in range(rows):
+            for col in range(cols):
+                nbrs = [r * cols + c for r, c in get_neighbors(row, col, rows, cols)]
+                self.neighbors.append(nbrs)
+                mask = 0
+                for n in nbrs:
+                    mask |= 1 << n
+                self.neighbor_masks.append(mask)
+
+        # Virtual union-find nodes for the four board edges
+        self.top, self.bottom, self.left, self.right = range(self.size, self.size + 4)
+        self.edge_nodes = [[], []]  # player -> cell index -> edge nodes it touches
+        for row in range(rows):
+            for col in range(cols):
+                self.edge_nodes[0].append([node for node, on_edge in
+                                           ((self.top, row == 0), (self.bottom, row == rows - 1)) if on_edge])
+                self.edge_nodes[1].append([node for node, on_edge in
+                                           ((self.left, col == 0), (self.right, col == cols - 1)) if on_edge])
+        self.goal_nodes = [(self.top, self.bottom), (self.left, self.right)]
+
+        # Clockwise ring around each cell: neighbor indices, edge nodes for
+        # positions off the board, -1 where a corner leaves the edge unclear
+        self.rings = []
+        for row in range(rows):
+            for col in range(cols):
+                ring = []
+                for dr, dc in ODD_COL_DIRECTIONS if col % 2 == 1 else EVEN_COL_DIRECTIONS:
+                    nr, nc = row + dr, col + dc
+                    off_rows = self.top if nr < 0 else self.bottom if nr >= rows else None
+                    off_cols = self.left if nc < 0 else self.right if nc >= cols else None
+                    if off_rows is None and off_cols is None:
+                        ring.append(nr * cols + nc)
+                    elif off_rows is not None and off_cols is not None:
+                        ring.append(-1)
+                    else:
+                        ring.append(off_cols if off_rows is None else off_rows)
+                self.rings.append(ring)
+        self.corner_counts = [ring.count(-1) for ring in self.rings]
+
+        # Zobrist keys, seeded per board size so hashes are stable across runs
+        rng = random.Random(f"zobrist {rows}x{cols}")
+        self.stone_keys = [[rng.getrandbits(64) for _ in range(self.size)] for _ in range(2)]
+        self.obstacle_keys = [rng.getrandbits(64) for _ in range(self.size)]
+        self.side_keys = [rng.getrandbits(64) for _ in range(2)]  # Player to move
+        self.perspective_keys = [rng.getrandbits(64) for _ in range(2)]  # Player searched for
+        self.schedule_keys = [rng.getrandbits(64) for _ in range(2 * 6 * 60)]  # Bonus-move schedule
+
+        top = sum(1 << c for c in range(cols))
+        left = sum(1 << (r * cols) for r in range(rows))
+        # Start and goal edge of each player: Red top/bottom, Blue left/right
+        self.start_masks = [top, left]
+        self.end_masks = [top << ((rows - 1) * cols), left << (cols - 1)]
+        self.start_cells = [list(iter_bits(m)) for m in self.start_masks]
+        self.end_cells = [list(iter_bits(m)) for m in self.end_masks]
+
+    def dilate(self, mask):
+        """Mask of all cells adjacent to a cell in mask"""
+        out = 0
+        neighbor_masks = self.neighbor_masks
+        for i in iter_bits(mask):
+            out |= neighbor_masks[i]
+        return out
+
+@lru_cache(maxsize=None)
+def board_geometry(rows, cols):
+    return Geometry(rows, cols)
+
+
+class Board:
+    """Stones as one bitmask per player plus an obstacle bitmask
+
+    Connectivity is tracked with a union-find over the cells and four
+    virtual edge nodes. It uses union by size without path compression so
+    every union can be rolled back: make() and unmake() must be called in
+    LIFO order, as the search does.
+    """
+
+    def __init__(self, rows, cols, obstacles=()):
+        self.rows = rows
+        self.cols = cols
+        self.geometry = board_geometry(rows, cols)
+        self.stones = [0, 0]  # player -> bitmask of cells
+        self.obstacle_mask = 0
+        self.hash = 0  # Zobrist hash of obstacles and stones
+        for row, col in obstacles:
+            self.obstacle_mask |= 1 << (row * cols + col)
+            self.hash ^= self.geometry.obstacle_keys[row * cols + col]
+        nodes = self.geometry.size + 4
+        self.parent = list(range(nodes))
+        self.set_size = [1] * nodes
+        self.union_log = []  # (child root, new root) for every union
+        self.marks = []  # union_log length before each make()
+
+    def copy(self):
+        """Independent board with the same stones and union-find state"""
+        other = Board.__new__(Board)
+        other.__dict__.update(self.__dict__)
+        other.stones = self.stones[:]
+        other.parent = self.parent[:]
+        other.set_size = self.set_size[:]
+        other.union_log = self.union_log[:]
+        other.marks = self.marks[:]
+        return other
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+    def cell(self, index):
+        return divmod(index, self.cols)
+
+    def owner(self, index):
+        bit = 1 << index
+        if self.stones[0] & bit:
+            return 0
+        if self.stones[1] & bit:
+            return 1
+        return None
+
+    def empty_mask(self):
+        return ~(self.stones[0] | self.stones[1] | self.obstacle_mask) & self.geometry.full_mask
+
+    def moves(self):
+        """Empty cell indices in row-major order"""
+        return list(iter_bits(self.empty_mask()))
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            node = parent[node]
+        return node
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.set_size[a] > self.set_size[b]:
+            a, b = b, a
+        self.parent[a] = b
+        self.set_size[b] += self.set_size[a]
+        self.union_log.append((a, b))
+
+    def make(self, index, player):
+        """Place a stone and join it to friendly neighbors and edges"""
+        stones = self.stones[player]
+        self.stones[player] = stones | 1 << index
+        self.marks.append(len(self.union_log))
+        geometry = self.geometry
+        self.hash ^= geometry.stone_keys[player][index]
+        for node in geometry.edge_nodes[player][index]:
+            self.union(index, node)
+        for n in geometry.neighbors[index]:
+            if stones >> n & 1:
+                self.union(index, n)
+
+    def unmake(self, index, player):
+        """Remove the most recently placed stone"""
+        self.stones[player] ^= 1 << index
+        self.hash ^= self.geometry.stone_keys[player][index]
+        mark = self.marks.pop()
+        log, parent, set_size = self.union_log, self.parent, self.set_size
+        while len(log) > mark:
+            child, root = log.pop()
+            parent[child] = child
+            set_size[root] -= set_size[child]
+
+    def is_connected(self, player):
+        """True if the player's stones join their two edges"""
+        start, end = self.geometry.goal_nodes[player]
+        return self.find(start) == self.find(end)
+
+
+class GameState:
+    """Board contents plus turn and bonus-move bookkeeping for one game"""
+
+    def __init__(self, rows=ROWS, cols=COLS, obstacles=None, seed=None):
+        self.rows = rows
+        self.cols = cols
+        self.rng = random.Random(seed)  # Drives obstacles and each game's bonus seed
+        self.obstacles = set(obstacles) if obstacles is not None else random_obstacles(rows, cols, self.rng)
+        self.restart(new_obstacles=False)
+
+    def restart(self, new_obstacles=True, bonus_seed=None):
+        """Clear the board and reset turn and bonus state
+
+        The game's bonus draws come from bonus_seed, drawn from the state's
+        generator unless given, so a game can be replayed from its record.
+        """
+        if new_obstacles:
+            self.obstacles = random_obstacles(self.rows, self.cols, self.rng)
+        self.board = Board(self.rows, self.cols, self.obstacles)
+        self.game_over = False
+        self.winner = None
+        self.turn = RED  # Player turn (0: Red, 1: Blue)
+        self.bonus_seed = self.rng.getrandbits(32) if bonus_seed is None else bonus_seed
+        self.bonus_rng = random.Random(self.bonus_seed)
+        self.bonus_move_counter = self.bonus_rng.randint(1, 5)
+        self.bonus_move_active = False
+        self.bonus_player = None
+        self.move_count = 0
+        self.moves = []  # (row, col) of every stone placed, in order
+
+    def copy(self):
+        """Independent copy, including the random generators"""
+        other = GameState.__new__(GameState)
+        other.__dict__.update(self.__dict__)
+        other.obstacles = set(self.obstacles)
+        other.board = self.board.copy()
+        other.moves = list(self.moves)
+        other.rng = random.Random()
+        other.rng.setstate(self.rng.getstate())
+        other.bonus_rng = random.Random()
+        other.bonus_rng.setstate(self.bonus_rng.getstate())
+        return other
+
+    def current_player(self):
+        """Player who places the next stone"""
+        return self.bonus_player if self.bonus_move_active else self.turn
+
+    def moves_until_bonus(self):
+        """Regular moves left before the next bonus move"""
+        moves_left = self.bonus_move_counter - (self.move_count % self.bonus_move_counter)
+        return moves_left if moves_left else self.bonus_move_counter
+
+    def owner(self, move):
+        """Player holding the hex at (row, col), or None"""
+        return self.board.owner(self.board.index(*move))
+
+    def is_valid_move(self, move):
+        row, col = move
+        return (0 <= row < self.rows and 0 <= col < self.cols
+                and self.board.empty_mask() >> self.board.index(row, col) & 1 == 1)
+
+    def get_valid_moves(self):
+        """Get all valid moves on the board"""
+        return [self.board.cell(i) for i in self.board.moves()]
+
+    def check_draw(self):
+        return self.board.empty_mask() == 0
+
+    # Function to check if a player has won
+    def check_win(self):
+        # For Red player (top to bottom)
+        if self.board.is_connected(RED):
+            return RED  # Red wins
+
+        # For Blue player (left to right)
+        if self.board.is_connected(BLUE):
+            return BLUE  # Blue wins
+
+        return None
+
+    def play(self, move):
+        """Place a stone for the current player and advance the turn"""
+        if self.game_over or not self.is_valid_move(move):
+            return False
+        self.board.make(self.board.index(*move), self.current_player())
+        self.moves.append(tuple(move))
+
+        # Check for win
+        self.winner = self.check_win()
+        if self.winner is not None:
+            self.game_over = True
+        elif self.check_draw():
+            self.game_over = True
+            self.winner = None  # Draw condition
+        else:
+            self.advance_turn()
+        return True
+
+    def advance_turn(self):
+        """Handle bonus move logic after a stone has been placed"""
+        if self.bonus_move_active:
+            self.bonus_move_counter = self.bonus_rng.randint(1, 5)
+            self.bonus_move_active = False
+            self.turn = 1 - self.bonus_player  # Next turn after bonus
+        else:
+            self.move_count += 1
+            # Check if it's time for a bonus move
+            if self.move_count % self.bonus_move_counter == 0:
+                self.bonus_move_active = True
+                self.bonus_player = self.turn  # Current player gets a bonus
+            else:
+                self.turn = 1 - self.turn  # Switch turn
+
+
+# AI Player with Alpha-Beta Pruning
+WIN_SCORE = 10000  # Beyond any shortest-path evaluation
+
+NO_PATH = 1000  # Distance reported when a player cannot connect
+
+FORCED_SCORE = WIN_SCORE - NO_PATH  # Beyond this a result is proven; expected values over bonus draws stay below
+
+def cell_costs(board, player):
+    """Flat per-cell cost list: 0 own stone, 1 empty, -1 blocked"""
+    cost = [1] * board.geometry.size
+    for i in iter_bits(board.stones[player]):
+        cost[i] = 0
+    for i in iter_bits(board.stones[1 - player] | board.obstacle_mask):
+        cost[i] = -1
+    return cost
+
+def distance_map(board, player, from_end=False, cost=None):
+    """Multi-source 0-1 BFS from one of the player's edges.
+
+    Returns a flat list holding, for every cell, the number of empty cells
+    on the cheapest path from the edge up to and including that cell.
+    Entering a cell costs that cell's own cost.
+    """
+    geometry = board.geometry
+    if cost is None:
+        cost = cell_costs(board, player)
+    neighbors = geometry.neighbors
+    dist = [NO_PATH] * geometry.size
+    queue = deque()
+
+    # Seed the whole edge at once
+    for c in (geometry.end_cells if from_end else geometry.start_cells)[player]:
+        w = cost[c]
+        if w < 0:
+            continue
+        dist[c] = w
+        if w:
+            queue.append(c)
+        else:
+            queue.appendleft(c)
+
+    while queue:
+        c = queue.popleft()
+        d = dist[c]
+        for n in neighbors[c]:
+            w = cost[n]
+            if w < 0 or d + w >= dist[n]:
+                continue
+            dist[n] = d + w
+            if w:
+                queue.append(n)
+            else:
+                queue.appendleft(n)
+    return dist
+
+def shortest_path_length(board, player):
+    """Calculate the shortest path length for a player"""
+    dist = distance_map(board, player)
+    return min(dist[c] for c in board.geometry.end_cells[player])  # NO_PATH if blocked
+
+def evaluate_board(board, player):
+    """Evaluate the current board state for the given player"""
+    # Positive when the opponent is further from connecting than we are
+    return shortest_path_length(board, 1 - player) - shortest_path_length(board, player)
+
+class DistanceTracker:
+    """Start-edge distance maps of both players, repaired on make/unmake
+
+    Placing a stone lowers the cost of its cell for the mover, so the
+    mover's map only needs improvements propagated outwards from it. For
+    the opponent the cell becomes blocked: only cells whose shortest path
+    ran through it are invalidated and recomputed from the untouched
+    cells around them. Every overwritten distance is logged so unmake()
+    restores the maps exactly. Calls must be LIFO, like Board.make().
+    """
+
+    PATH_CACHE_SIZE = 100000  # Entries kept before the cache starts over
+
+    def __init__(self, board):
+        self.board = board
+        self.geometry = board.geometry
+        self.cost = [cell_costs(board, RED), cell_costs(board, BLUE)]
+        self.dist = [distance_map(board, p, cost=self.cost[p]) for p in (RED, BLUE)]
+        self.log = []  # (dist list, cell, old distance)
+        self.marks = []
+        self.path_cache = {}  # (board hash, player) -> path_masks() result
+
+    def make(self, index, player):
+        self.marks.append(len(self.log))
+        opponent = 1 - player
+        self.cost[player][index] = 0
+        self.cost[opponent][index] = -1
+        self._lower(player, index)
+        self._block(opponent, index)
+
+    def unmake(self, index, player):
+        self.cost[player][index] = 1
+        self.cost[1 - player][index] = 1
+        mark = self.marks.pop()
+        log = self.log
+        while len(log) > mark:
+            dist, cell, old = log.pop()
+            dist[cell] = old
+
+    def length(self, player):
+        dist = self.dist[player]
+        return min(dist[c] for c in self.geometry.end_cells[player])
+
+    def evaluate(self, player):
+        """Same value as evaluate_board() for the tracked board"""
+        return self.length(1 - player) - self.length(player)
+
+    def path_masks(self, player):
+        """Masks of the empty cells on some and on every shortest path
+
+        Every shortest path enters exactly one empty cell at each start
+        distance 1..length, so a cell lies on all of them exactly when
+        no other shortest-path cell shares its start distance.
+        """
+        key = (self.board.hash, player)
+        cached = self.path_cache.get(key)
+        if cached is not None:
+            return cached
+        if len(self.path_cache) >= self.PATH_CACHE_SIZE:
+            self.path_cache.clear()
+        length = self.length(player)
+        if length >= NO_PATH:
+            return 0, 0
+        cost = self.cost[player]
+        from_end = distance_map(self.board, player, from_end=True, cost=cost)
+        mask = 0
+        levels = {}  # start distance -> shortest-path cells at it
+        for c, (a, b, w) in enumerate(zip(self.dist[player], from_end, cost)):
+            if w == 1 and a + b - 1 == length:
+                mask |= 1 << c
+                levels.setdefault(a, []).append(c)
+        every = 0
+        for cells in levels.values():
+            if len(cells) == 1:
+                every |= 1 << cells[0]
+        self.path_cache[key] = mask, every
+        return mask, every
+
+    def path_mask(self, player):
+        """Mask of the empty cells on one shortest path (0 if cut off)
+
+        Searches back from the cheapest goal edge cell along the steps
+        the distances were reached by until it meets the start edge.
+        """
+        dist, cost = self.dist[player], self.cost[player]
+        geometry = self.geometry
+        end = min(geometry.end_cells[player], key=dist.__getitem__)
+        if dist[end] >= NO_PATH:
+            return 0
+        starts = geometry.start_masks[player]
+        came_from = {end: None}
+        queue = deque([end])
+        while queue:
+            c = queue.popleft()
+            before = dist[c] - cost[c]
+            if starts >> c & 1 and before == 0:
+                break
+            for n in geometry.neighbors[c]:
+                if n not in came_from and cost[n] >= 0 and dist[n] == before:
+                    came_from[n] = c
+                    queue.append(n)
+        mask = 0
+        while c is not None:
+            if cost[c]:
+                mask |= 1 << c
+            c = came_from[c]
+        return mask
+
+    def _lower(self, player, index):
+        """The cell now costs 0: propagate shorter distances with a 0-1 BFS"""
+        dist, cost, log = self.dist[player], self.cost[player], self.log
+        if dist[index] >= NO_PATH:
+            return  # Still cut off from the start edge
+        log.append((dist, index, dist[index]))
+        dist[index] -= 1
+        neighbors = self.geometry.neighbors
+        queue = deque([index])
+        while queue:
+            c = queue.popleft()
+            d = dist[c]
+            for n in neighbors[c]:
+                w = cost[n]
+                if w < 0 or d + w >= dist[n]:
+                    continue
+                log.append((dist, n, dist[n]))
+                dist[n] = d + w
+                if w:
+                    queue.append(n)
+                else:
+                    queue.appendleft(n)
+
+    def _block(self, player, index):
+        """The cell is now blocked: recompute the cells that depended on it"""
+        dist, cost, log = self.dist[player], self.cost[player], self.log
+        if dist[index] >= NO_PATH:
+            return
+        neighbors = self.geometry.neighbors
+
+        # Cells with a shortest path through the blocked cell
+        affected = [index]
+        seen = {index}
+        for c in affected:
+            d = dist[c]
+            for n in neighbors[c]:
+                w = cost[n]
+                if w >= 0 and n not in seen and dist[n] == d + w:
+                    seen.add(n)
+                    affected.append(n)
+        for c in affected:
+            log.append((dist, c, dist[c]))
+            dist[c] = NO_PATH
+
+        # Reseed them from the start edge and their untouched neighbors
+        starts = self.geometry.start_masks[player]
+        heap = []
+        for c in affected[1:]:
+            w = cost[c]
+            best = w if starts >> c & 1 else NO_PATH
+            for n in neighbors[c]:
+                if n not in seen and dist[n] + w < best:
+                    best = dist[n] + w
+            if best < NO_PATH:
+                dist[c] = best
+                heap.append((best, c))
+        heapq.heapify(heap)
+        while heap:
+            d, c = heapq.heappop(heap)
+            if d > dist[c]:
+                continue
+            for n in neighbors[c]:
+                w = cost[n]
+                if w >= 0 and d + w < dist[n]:
+                    dist[n] = d + w
+                    heapq.heappush(heap, (d + w, n))
+
+# Inferior cells and virtual connections
+#
+# A cell is useless to a player when no minimal connection of theirs can
+# run through it; it is dead when it is useless to both, and then its
+# color never matters. These are local tests on the ring of six
+# positions around the cell, with board edges counting as stones of
+# the player they belong to and obstacles as blocked for everyone.
+OWN, OPEN, BLOCKED = 2, 1, 0  # Ring position types
+
+def ring_types(board, cell, player, own, blocked):
+    """Clockwise types of the positions around cell, as seen by player"""
+    geometry = board.geometry
+    size = geometry.size
+    own_edges = geometry.goal_nodes[player]
+    types = []
+    for n in geometry.rings[cell]:
+        if n < 0:
+            types.append(OPEN)  # Unclear corner: assume nothing
+        elif n >= size:
+            types.append(OWN if n in own_edges else BLOCKED)
+        elif own >> n & 1:
+            types.append(OWN)
+        elif blocked >> n & 1:
+            types.append(BLOCKED)
+        else:
+            types.append(OPEN)
+    return types
+
+def is_useless(types):
+    """A path through the cell can always skip it: all unblocked positions
+    form one arc whose inner positions are own stones (or, with nothing
+    blocked, at most two adjacent open positions break the own ring)"""
+    if BLOCKED not in types:
+        gaps = [i for i, t in enumerate(types) if t == OPEN]
+        return len(gaps) <= 1 or len(gaps) == 2 and gaps[1] - gaps[0] in (1, 5)
+    start = types.index(BLOCKED)
+    arcs = []
+    arc = None
+    for k in range(1, 7):
+        t = types[(start + k) % 6]
+        if t == BLOCKED:
+            arc = None
+        elif arc is None:
+            arc = [t]
+            arcs.append(arc)
+        else:
+            arc.append(t)
+    if len(arcs) > 1:
+        return False
+    return not arcs or all(t == OWN for t in arcs[0][1:-1])
+
+def is_dead(board, cell, extra=-1, extra_player=None):
+    """True if the cell is useless to both players, optionally with an
+    extra stone of extra_player on the empty cell extra"""
+    for player in (RED, BLUE):
+        own = board.stones[player]
+        blocked = board.stones[1 - player] | board.obstacle_mask
+        if extra >= 0:
+            if player == extra_player:
+                own |= 1 << extra
+            else:
+                blocked |= 1 << extra
+        if not is_useless(ring_types(board, cell, player, own, blocked)):
+            return False
+    return True
+
+def open_cells(board, limit):
+    """Mask of empty cells with at most limit open positions around them
+
+    A useless cell has at most two open positions in its ring, so this
+    cheap count rules out most of the board before the ring tests.
+    """
+    geometry = board.geometry
+    neighbor_masks = geometry.neighbor_masks
+    corner_counts = geometry.corner_counts
+    empty = board.empty_mask()
+    mask = 0
+    for c in iter_bits(empty):
+        if bin(neighbor_masks[c] & empty).count("1") + corner_counts[c] <= limit:
+            mask |= 1 << c
+    return mask
+
+def dead_cells(board):
+    """Mask of empty cells that are dead"""
+    mask = 0
+    for c in iter_bits(open_cells(board, 2)):
+        if is_dead(board, c):
+            mask |= 1 << c
+    return mask
+
+def captured_cells(board, player):
+    """Mask of empty cells captured by player: adjacent empty pairs where
+    the player's stone on either cell leaves the other one dead, so the
+    player can always answer an intrusion and lose nothing"""
+    candidates = open_cells(board, 3)  # Each cell of the pair is open towards the other
+    neighbors = board.geometry.neighbors
+    mask = 0
+    for a in iter_bits(candidates):
+        for b in neighbors[a]:
+            if b > a and candidates >> b & 1 and is_dead(board, b, a, player) and is_dead(board, a, b, player):
+                mask |= 1 << a | 1 << b
+    return mask
+
+def virtual_connection(board, player):
+    """Number of links in a virtual connection between the player's edges, or None
+
+    Groups (and edges) sharing two empty neighbor cells are linked: if
+    the opponent takes one cell, the player takes the other. The links
+    of the returned connection use disjoint pairs of cells, so each one
+    needs a single move from the player, and only when the player can
+    answer every intrusion before the opponent moves again.
+    """
+    geometry = board.geometry
+    start, end = geometry.goal_nodes[player]
+    find = board.find
+    if find(start) == find(end):
+        return 0
+    empty = board.empty_mask()
+    groups = {}  # union-find root -> stones of the group
+    for i in iter_bits(board.stones[player]):
+        root = find(i)
+        groups[root] = groups.get(root, 0) | 1 << i
+    liberties = {root: geometry.dilate(stones) & empty for root, stones in groups.items()}
+    for edge, edge_cells in ((start, geometry.start_masks[player]), (end, geometry.end_masks[player])):
+        root = find(edge)
+        liberties[root] = liberties.get(root, 0) | edge_cells & empty
+
+    # Fewest links from the start edge to the end edge
+    source, target = find(start), find(end)
+    previous = {source: None}
+    frontier = [source]
+    while frontier and target not in previous:
+        following = []
+        for u in frontier:
+            for v in liberties:
+                if v not in previous and bin(liberties[u] & liberties[v]).count("1") >= 2:
+                    previous[v] = u
+                    following.append(v)
+        frontier = following
+    if target not in previous:
+        return None
+
+    # Give every link two cells of its own
+    used = 0
+    links = 0
+    v = target
+    while previous[v] is not None:
+        u = previous[v]
+        common = liberties[u] & liberties[v] & ~used
+        for _ in range(2):
+            if not common:
+                return None
+            low = common & -common
+            used |= low
+            common ^= low
+        links += 1
+        v = u
+    return links
+
+# Transposition table entry flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+class TranspositionTable:
+    """Fixed-size table of (key, depth, flag, value, move, generation) entries
+
+    Each bucket has a depth-preferred slot, which keeps the deepest result
+    of the current search, and an always-replace slot for everything
+    else. The table is meant to live for a whole game; new_search() ages
+    out entries from earlier moves.
+    """
+
+    ENTRY_BYTES = 160  # Rough CPython footprint of one stored entry
+
+    def __init__(self, max_mb=16):
+        buckets = 1
+        while buckets * 2 * 2 * self.ENTRY_BYTES <= max_mb * 2**20:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.deep = [None] * buckets
+        self.recent = [None] * buckets
+        self.generation = 0
+        self.probes = self.hits = 0
+
+    def clear(self):
+        self.deep = [None] * len(self.deep)
+        self.recent = [None] * len(self.recent)
+        self.probes = self.hits = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        self.probes += 1
+        i = key & self.mask
+        entry = self.deep[i]
+        if entry is None or entry[0] != key:
+            entry = self.recent[i]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, value, move):
+        i = key & self.mask
+        entry = (key, depth, flag, value, move, self.generation)
+        old = self.deep[i]
+        if old is None or old[0] == key or depth >= old[1] or old[5] != self.generation:
+            self.deep[i] = entry
+        else:
+            self.recent[i] = entry
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+# Win scores are stored relative to the node so they stay valid at other depths
+def value_to_tt(value, depth):
+    if value > FORCED_SCORE:
+        return value - depth
+    if value < -FORCED_SCORE:
+        return value + depth
+    return value
+
+def value_from_tt(value, depth):
+    if value > FORCED_SCORE:
+        return value + depth
+    if value < -FORCED_SCORE:
+        return value - depth
+    return value
+
+
+# The bonus-move rule as the search sees it: a schedule is the tuple
+# (turn, bonus_move_active, bonus_player, regular moves left until the
+# next bonus, move_count). Regular moves are deterministic; the counter
+# redraw after a bonus move is a chance node.
+def game_schedule(state):
+    left = 0 if state.bonus_move_active else state.moves_until_bonus()
+    return (state.turn, state.bonus_move_active, state.bonus_player, left, state.move_count)
+
+def schedule_mover(schedule):
+    turn, active, bonus_player, _, _ = schedule
+    return bonus_player if active else turn
+
+# Function to advance a schedule past a regular move (see GameState.advance_turn)
+def next_schedule(schedule):
+    turn, _, _, left, move_count = schedule
+    if left == 1:
+        return (turn, True, turn, 0, move_count + 1)
+    return (1 - turn, False, None, left - 1, move_count + 1)
+
+# Function to list (probability, schedule) outcomes of the counter redraw after a bonus move
+def redraw_outcomes(schedule, horizon):
+    """Counters that give the same number of moves until the next bonus are
+    merged, and so are all bonuses that fall beyond the search horizon."""
+    _, _, bonus_player, _, move_count = schedule
+    counts = {}
+    for counter in range(1, 6):  # randint(1, 5)
+        left = min(counter - move_count % counter, max(horizon, 1))
+        counts[left] = counts.get(left, 0) + 1
+    outcomes = [(n / 5, (1 - bonus_player, False, None, left, move_count))
+                for left, n in counts.items()]
+    outcomes.sort(key=lambda o: (-o[0], o[1][3]))  # Most likely first
+    return outcomes
+
+def guaranteed_moves(schedule, player, horizon):
+    """Moves player is sure to make after the one now being played, before
+    the opponent could get two moves in a row. After a counter redraw the
+    opponent is assumed to get a bonus at its first regular move, and so
+    it is past the horizon (the last horizon moves from here on), since
+    redraw_outcomes merges the bonuses out there."""
+    movers = []
+    while True:
+        movers.append(schedule_mover(schedule))
+        if len(movers) == horizon:
+            movers += [1 - player, 1 - player]
+            break
+        if schedule[1]:
+            if schedule[2] == player:
+                movers += [1 - player, 1 - player]
+            else:
+                movers += [player, 1 - player, 1 - player]
+            break
+        schedule = next_schedule(schedule)
+    count = 0
+    last = None
+    for mover in movers[1:]:
+        if mover == player:
+            count += 1
+        elif last == mover:
+            break
+        last = mover
+    return count
+
+def schedule_key(geometry, schedule):
+    _, active, _, left, move_count = schedule
+    return geometry.schedule_keys[((6 if active else 0) + left) * 60 + move_count % 60]
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out or it is cancelled"""
+
+
+class AlphaBeta:
+    """Alpha-Beta search for one player on a private copy of the board
+
+    Moves are ordered by the principal variation of the previous
+    iteration, the transposition table move, killer moves, the history
+    heuristic, whether the cell lies on either player's shortest path
+    and the local pattern around it (see hex_patterns).
+
+    Turns follow the bonus-move rule, so a player may move twice in a
+    row. The counter redraw after a bonus move is a chance node whose
+    value is the expected value of its outcomes (expectiminimax),
+    pruned with Star1 and Star2.
+
+    Dead and captured cells are left out where that cannot change the
+    value, and a virtual connection the mover has time to complete is
+    scored as a win. On large boards only the relevance window is
+    searched above the leaves: cells within two steps of a stone and
+    the cells of one shortest path of each player, and of those only
+    the best WINDOW_MOVES in move order (window_moves, if given). This
+    is forward pruning and, unlike the rest, not sound: a move cut there
+    is never searched, so on those boards the value may differ from a
+    full-width search.
+    """
+
+    CHECK_SECONDS = 0.002  # Aimed time between clock checks
+    CHECK_EVERY = 1024  # Most nodes between clock checks
+    PROGRESS_EVERY = 1024  # Nodes between progress reports
+    INFERIOR_DEPTH = 3  # Shallower nodes skip the dead and captured cell analysis
+    WINDOW_CELLS = 100  # Boards with more cells than this search the relevance window
+    WINDOW_MOVES = 24  # Moves kept per node there (forward pruning)
+    PATTERN_WEIGHT = 10  # Ordering score per point of pattern priority
+
+    def __init__(self, state, player, tt=None, deadline=None, stop=None, on_progress=None,
+                 evaluator=None, window_moves=None):
+        self.board = state.board.copy()
+        self.player = player
+        self.opponent = 1 - player
+        self.tt = tt
+        self.deadline = deadline
+        self.stop = stop  # Event-like object; search is abandoned once it is set
+        self.on_progress = on_progress  # Called as on_progress(depth, nodes)
+        self.evaluator = evaluator  # Replaces the shortest-path evaluation, e.g. hex_resistance
+        if window_moves is not None:
+            self.WINDOW_MOVES = window_moves
+        self.tracker = DistanceTracker(self.board)
+        from hex_patterns import PatternCodes  # Imported lazily, it imports this module
+        self.patterns = PatternCodes(self.board)
+        self.depth = 0  # Depth of the iteration in progress
+        self.nodes = 0
+        self.next_check = 1  # Node count of the next clock check
+        self.next_progress = self.PROGRESS_EVERY
+        self.checked = (0, time.perf_counter())  # Nodes and time at the last check
+        self.pv = []  # Best line of the last completed iteration
+        self.killers = {}  # ply -> up to two moves that caused a cutoff
+        self.history = [[0] * self.board.geometry.size for _ in range(2)]
+        geometry = self.board.geometry
+        self.max_key = geometry.side_keys[player] ^ geometry.perspective_keys[player]
+        self.min_key = geometry.side_keys[self.opponent] ^ geometry.perspective_keys[player]
+        self.schedule = game_schedule(state)
+        if schedule_mover(self.schedule) != player:
+            # Asked to move out of turn: search as if it were a regular turn of player
+            self.schedule = (player, False, None, self.schedule[3] or 1, self.schedule[4])
+
+    def make(self, m, p):
+        self.board.make(m, p)
+        self.tracker.make(m, p)
+        self.patterns.make(m, p)
+
+    def unmake(self, m, p):
+        self.board.unmake(m, p)
+        self.tracker.unmake(m, p)
+        self.patterns.unmake(m, p)
+
+    def count_node(self):
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_clock()
+
+    def check_clock(self):
+        """Report progress and give up once stopped or out of time
+
+        Nodes cost anywhere from microseconds on small boards to a
+        millisecond on large ones, so the next check is placed
+        CHECK_SECONDS ahead (or at the deadline, if sooner) at the node
+        rate measured since the last one.
+        """
+        nodes = self.nodes
+        now = time.perf_counter()
+        if self.on_progress is not None and nodes >= self.next_progress:
+            self.on_progress(self.depth, nodes)
+            self.next_progress = nodes + self.PROGRESS_EVERY
+        if self.stop is not None and self.stop.is_set():
+            raise SearchTimeout()
+        seconds = self.CHECK_SECONDS
+        if self.deadline is not None:
+            if now >= self.deadline:
+                raise SearchTimeout()
+            seconds = min(seconds, self.deadline - now)
+        last_nodes, last_time = self.checked
+        rate = (nodes - last_nodes) / max(now - last_time, 1e-6)
+        self.checked = (nodes, now)
+        self.next_check = nodes + max(1, min(self.CHECK_EVERY, int(rate * seconds)))
+
+    def evaluate(self):
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(self.board, self.player)
+        return self.tracker.evaluate(self.player)
+
+    def probe(self, key, alpha, beta, depth):
+        """Return (cutoff value or None, stored best move)"""
+        entry = self.tt.probe(key)
+        if entry is None:
+            return None, None
+        _, entry_depth, flag, value, move, _ = entry
+        if entry_depth >= depth:
+            value = value_from_tt(value, depth)
+            if flag == EXACT or flag == LOWER and value >= beta or flag == UPPER and value <= alpha:
+                return value, move
+        return None, move
+
+    def store(self, key, depth, v, alpha, beta, move):
+        flag = UPPER if v <= alpha else LOWER if v >= beta else EXACT
+        self.tt.store(key, depth, flag, value_to_tt(v, depth), move)
+
+    def ordered_moves(self, ply, depth, mover, tt_move, schedule=None):
+        """Moves worth trying, most promising first (lazily just above the leaves)
+
+        schedule defaults to the root's.
+        """
+        if schedule is None:
+            schedule = self.schedule
+        if depth == 1 and self.evaluator is not None:
+            return self.evaluated_moves(ply, mover, tt_move, schedule)
+        if depth == 1:
+            moves = self.frontier_moves(ply, mover, tt_move)
+            return moves if ply else list(moves)
+        if depth >= self.INFERIOR_DEPTH:
+            candidates = self.candidate_mask(mover, schedule)
+        else:
+            candidates = self.board.empty_mask()
+        windowed = self.board.geometry.size > self.WINDOW_CELLS
+        if windowed:
+            candidates = candidates & self.relevance_window() or candidates
+        moves = self.sorted_moves(ply, mover, tt_move, candidates)
+        return moves[:self.WINDOW_MOVES] if windowed else moves
+
+    def sorted_moves(self, ply, mover, tt_move, candidates):
+        """The candidate cells sorted by the cheap move ordering, best first"""
+        moves = list(iter_bits(candidates))
+        scores = dict.fromkeys(moves, 0)
+        # Cells on either player's shortest path
+        for p in (RED, BLUE):
+            for m in iter_bits(self.tracker.path_masks(p)[0] & candidates):
+                scores[m] += 1000
+        history = self.history[mover]
+        tables = self.patterns.tables
+        ring_priority, ring = tables.ring_priority[mover], self.patterns.ring
+        outer_priority, outer = tables.outer_priority[mover], self.patterns.outer
+        weight = self.PATTERN_WEIGHT
+        for m in moves:
+            scores[m] += history[m] + weight * (ring_priority[ring[m]] + outer_priority[outer[m]])
+        for rank, m in enumerate(self.killers.get(ply, ())):
+            if m in scores:
+                scores[m] += 1000000 - rank
+        if tt_move in scores:
+            scores[tt_move] += 100000000
+        if ply < len(self.pv) and self.pv[ply] in scores:
+            scores[self.pv[ply]] += 1000000000
+        moves.sort(key=scores.__getitem__, reverse=True)
+        return moves
+
+    def evaluated_moves(self, ply, mover, tt_move, schedule):
+        """Moves of a node just above the leaves, for a plug-in evaluator
+
+        The evaluator scores every child in one batch, and the moves are
+        sorted best first for mover by those scores. On windowed boards
+        the cheap ordering first cuts the window to WINDOW_MOVES, so only
+        the moves that are searched get evaluated.
+        """
+        candidates = self.candidate_mask(mover, schedule)
+        if self.board.geometry.size > self.WINDOW_CELLS:
+            candidates = candidates & self.relevance_window() or candidates
+            moves = self.sorted_moves(ply, mover, tt_move, candidates)[:self.WINDOW_MOVES]
+        else:
+            moves = list(iter_bits(candidates))
+        values = self.evaluator.child_values(self.board, moves, mover, self.player)
+        order = sorted(range(len(moves)), key=values.__getitem__, reverse=mover == self.player)
+        return [moves[i] for i in order]
+
+    def candidate_mask(self, mover, schedule):
+        """Empty cells minus the dead ones and, when the opponent moves
+        right after this move, minus the cells the opponent has captured
+        (it answers an intrusion at once and the stone there is dead)"""
+        board = self.board
+        empty = board.empty_mask()
+        inferior = self.patterns.dead_mask(empty)
+        if schedule[1] or schedule[3] != 1:
+            inferior |= captured_cells(board, 1 - mover)
+        moves = empty & ~inferior
+        return moves or empty & -empty  # Nothing left worth a move: any cell will do
+
+    def relevance_window(self):
+        """Cells near the stones or on either player's shortest path
+
+        An empty board has no stones, so the cells around the center
+        stand in for them.
+        """
+        board = self.board
+        geometry = board.geometry
+        stones = board.stones[RED] | board.stones[BLUE]
+        if not stones:
+            stones = 1 << (geometry.rows // 2 * geometry.cols + geometry.cols // 2)
+        near = geometry.dilate(stones)
+        window = near | geometry.dilate(near)
+        for p in (RED, BLUE):
+            window |= self.tracker.path_mask(p)
+        return window
+
+    def frontier_moves(self, ply, mover, tt_move):
+        """Moves of a node just above the leaves
+
+        The evaluation after a move is known without playing it unless
+        the cell lies on every shortest path of the opponent: otherwise
+        the opponent's length stays, and the mover's drops by one exactly
+        when the cell is on one of its own shortest paths. So only those
+        cells are searched, plus one stand-in for each of the two other
+        groups, and the value is unchanged. The principal variation,
+        transposition and killer moves come first, before the shortest
+        paths are worked out, since they usually cut the node off.
+        """
+        empty = self.board.empty_mask()
+        tried = 0
+        first = [self.pv[ply]] if ply < len(self.pv) else []
+        for m in first + [tt_move] + self.killers.get(ply, []):
+            if m is not None and empty >> m & 1 and not tried >> m & 1:
+                tried |= 1 << m
+                yield m
+
+        own, _ = self.tracker.path_masks(mover)
+        _, blocking = self.tracker.path_masks(1 - mover)
+        rest = empty & ~blocking
+        moves = blocking & ~tried
+        for group in (rest & own, rest & ~own):
+            if group and not group & tried:
+                moves |= group & -group
+        history = self.history[mover]
+        yield from sorted(iter_bits(moves), key=history.__getitem__, reverse=True)
+
+    def cutoff(self, ply, depth, mover, m):
+        """Remember a move that refuted the position"""
+        killers = self.killers.setdefault(ply, [])
+        if m not in killers:
+            killers.insert(0, m)
+            del killers[2:]
+        self.history[mover][m] += depth * depth
+
+    def win_value(self, mover, depth, schedule):
+        """Score for the player searched once mover has moved, if mover has won
+
+        Besides a finished connection this counts a virtual connection,
+        provided mover can answer every intrusion and make all its moves
+        before the opponent can play twice in a row.
+        """
+        board = self.board
+        if board.is_connected(mover):
+            value = WIN_SCORE + depth  # Prefer faster wins
+        else:
+            guaranteed = guaranteed_moves(schedule, mover, depth)
+            if self.tracker.length(mover) > guaranteed:
+                return None
+            links = virtual_connection(board, mover)
+            if links is None or links > guaranteed:
+                return None
+            value = WIN_SCORE + depth - links
+        return value if mover == self.player else -value
+
+    def node_value(self, alpha, beta, depth, ply, schedule, probe=False):
+        if schedule_mover(schedule) == self.player:
+            return self.max_value(alpha, beta, depth, ply, schedule, probe)
+        return self.min_value(alpha, beta, depth, ply, schedule, probe)
+
+    def after_move(self, alpha, beta, depth, ply, schedule):
+        """Value once the player to move in schedule has placed a stone"""
+        if schedule[1]:
+            return self.chance_value(alpha, beta, depth, ply, schedule)
+        return self.node_value(alpha, beta, depth, ply, next_schedule(schedule))
+
+    def chance_value(self, alpha, beta, depth, ply, schedule):
+        """Expected value over the counter redraw that follows a bonus move
+
+        Star1 narrows each outcome's window using the value bounds of the
+        outcomes not yet searched. Star2 first probes every outcome with
+        only its first move, which bounds it from one side (all outcomes
+        have the same player to move), and cuts off if those bounds
+        alone settle the node.
+        """
+        outcomes = redraw_outcomes(schedule, depth)
+        if len(outcomes) == 1:
+            return self.node_value(alpha, beta, depth, ply, outcomes[0][1])
+        hi = WIN_SCORE + self.depth
+        lo = -hi
+        lower = [lo] * len(outcomes)
+        upper = [hi] * len(outcomes)
+        maximizing = schedule_mover(outcomes[0][1]) == self.player
+
+        # Star2 probing
+        for i, (p, child) in enumerate(outcomes):
+            if maximizing:
+                # Bounds found so far, best case for the outcomes still to probe
+                rest = sum(q * b for (q, _), b in zip(outcomes[:i], lower)) + \
+                    sum(q for q, _ in outcomes[i + 1:]) * hi
+                v, _ = self.node_value(lo, min((beta - rest) / p, hi), depth, ply, child, probe=True)
+                lower[i] = v
+                bound = sum(q * b for (q, _), b in zip(outcomes, lower))
+                if bound >= beta:
+                    return bound, [None]
+            else:
+                rest = sum(q * b for (q, _), b in zip(outcomes[:i], upper)) + \
+                    sum(q for q, _ in outcomes[i + 1:]) * lo
+                v, _ = self.node_value(max((alpha - rest) / p, lo), hi, depth, ply, child, probe=True)
+                upper[i] = v
+                bound = sum(q * b for (q, _), b in zip(outcomes, upper))
+                if bound <= alpha:
+                    return bound, [None]
+
+        # Star1 search of every outcome
+        seen = 0.0
+        line = [None]
+        for i, (p, child) in enumerate(outcomes):
+            rest_lower = sum(q * b for (q, _), b in zip(outcomes[i + 1:], lower[i + 1:]))
+            rest_upper = sum(q * b for (q, _), b in zip(outcomes[i + 1:], upper[i + 1:]))
+            child_alpha = (alpha - seen - rest_upper) / p
+            child_beta = (beta - seen - rest_lower) / p
+            v, rest = self.node_value(child_alpha, child_beta, depth, ply, child)
+            if v <= child_alpha:
+                return seen + p * v + rest_upper, [None]
+            if v >= child_beta:
+                return seen + p * v + rest_lower, [None]
+            seen += p * v
+            if i == 0:
+                line = rest  # Principal variation follows the likeliest outcome
+        return seen, line
+
+    def max_value(self, alpha, beta, depth, ply=0, schedule=None, probe=False):
+        """With probe set only the first move is searched, giving a lower bound"""
+        self.count_node()
+        player = self.player
+        if depth == 0:
+            return self.evaluate(), [None]
+        if schedule is None:
+            schedule = self.schedule
+
+        tt_move = None
+        tt = self.tt
+        if tt is not None:
+            key = self.board.hash ^ self.max_key ^ schedule_key(self.board.geometry, schedule)
+            value, tt_move = self.probe(key, alpha, beta, depth)
+            if value is not None and ply > 0:
+                return value, [tt_move]
+        alpha_orig = alpha
+
+        if not self.board.empty_mask():
+            return 0, [None]  # Board full without a connection: draw
+        v = float('-inf')
+        line = [None]
+        for m in self.ordered_moves(ply, depth, player, tt_move, schedule):
+            # Make move
+            self.make(m, player)
+
+            # Get value, scoring a won position at once
+            v2, rest = self.win_value(player, depth, schedule), []
+            if v2 is None:
+                v2, rest = self.after_move(alpha, beta, depth - 1, ply + 1, schedule)
+
+            # Undo move
+            self.unmake(m, player)
+
+            if v2 > v:
+                v = v2
+                line = [m] + rest
+
+            if v >= beta:
+                self.cutoff(ply, depth, player, m)
+                break
+
+            alpha = max(alpha, v)
+            if probe:
+                return v, line
+
+        if tt is not None and not probe:
+            self.store(key, depth, v, alpha_orig, beta, line[0])
+        return v, line
+
+    def min_value(self, alpha, beta, depth, ply, schedule, probe=False):
+        """With probe set only the first move is searched, giving an upper bound"""
+        self.count_node()
+        if depth == 0:
+            return self.evaluate(), [None]
+
+        opponent = self.opponent
+        tt_move = None
+        tt = self.tt
+        if tt is not None:
+            key = self.board.hash ^ self.min_key ^ schedule_key(self.board.geometry, schedule)
+            value, tt_move = self.probe(key, alpha, beta, depth)
+            if value is not None:
+                return value, [tt_move]
+        beta_orig = beta
+
+        if not self.board.empty_mask():
+            return 0, [None]  # Board full without a connection: draw
+        v = float('inf')
+        line = [None]
+        for m in self.ordered_moves(ply, depth, opponent, tt_move, schedule):
+            # Make move
+            self.make(m, opponent)
+
+            # Get value, scoring a lost position at once
+            v2, rest = self.win_value(opponent, depth, schedule), []
+            if v2 is None:
+                v2, rest = self.after_move(alpha, beta, depth - 1, ply + 1, schedule)
+
+            # Undo move
+            self.unmake(m, opponent)
+
+            if v2 < v:
+                v = v2
+                line = [m] + rest
+
+            if v <= alpha:
+                self.cutoff(ply, depth, opponent, m)
+                break
+
+            beta = min(beta, v)
+            if probe:
+                return v, line
+
+        if tt is not None and not probe:
+            self.store(key, depth, v, alpha, beta_orig, line[0])
+        return v, line
+
+    def search(self, depth):
+        """Search to a fixed depth; returns (value, principal variation)"""
+        self.depth = depth
+        value, line = self.max_value(float('-inf'), float('inf'), depth)
+        self.pv = [m for m in line if m is not None]
+        return value, self.pv
+
+
+class SearchStats:
+    """What one move's search did, filled in by InstrumentedAlphaBeta"""
+
+    def __init__(self):
+        self.iterations = []  # Completed depths: dict of depth, nodes, seconds, value, pv
+        self.nodes = 0  # All nodes, including an unfinished last iteration
+        self.expanded = 0  # Nodes whose moves were generated
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0  # Cutoffs by the first ordered move
+        self.chance_nodes = 0  # Counter redraws with more than one outcome in the horizon
+        self.evaluations = 0
+        self.eval_time = 0.0  # Seconds in leaf evaluation
+        self.movegen_time = 0.0  # Seconds generating and ordering moves
+        self.update_time = 0.0  # Seconds in make/unmake, incremental distances included
+        self.tt_probes = 0
+        self.tt_hits = 0  # Probes that found an entry
+        self.tt_cutoffs = 0  # Probes whose entry settled the node
+        self.seconds = 0.0
+        self.move = None
+        self.pv = []  # (row, col) moves of the deepest completed iteration
+
+    def cutoff_rate(self):
+        return self.cutoffs / self.expanded if self.expanded else 0.0
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def branching_factor(self):
+        """Effective branching factor: node growth between the last two iterations"""
+        if len(self.iterations) >= 2 and self.iterations[-2]["nodes"]:
+            return self.iterations[-1]["nodes"] / self.iterations[-2]["nodes"]
+        if self.iterations:
+            last = self.iterations[-1]
+            return last["nodes"] ** (1 / last["depth"])
+        return 0.0
+
+    def to_dict(self):
+        return {"move": self.move, "seconds": self.seconds, "nodes": self.nodes,
+                "iterations": self.iterations, "pv": self.pv,
+                "cutoff_rate": self.cutoff_rate(),
+                "first_move_cutoff_rate": self.first_move_cutoff_rate(),
+                "chance_nodes": self.chance_nodes,
+                "branching_factor": self.branching_factor(),
+                "evaluations": self.evaluations, "eval_time": self.eval_time,
+                "movegen_time": self.movegen_time, "update_time": self.update_time,
+                "tt_probes": self.tt_probes, "tt_hits": self.tt_hits, "tt_cutoffs": self.tt_cutoffs}
+
+
+class InstrumentedAlphaBeta(AlphaBeta):
+    """AlphaBeta that counts and times its work into a SearchStats
+
+    Kept apart from AlphaBeta so the timers cost nothing unless asked for.
+    """
+
+    def __init__(self, state, player, stats, tt=None, deadline=None, stop=None, on_progress=None,
+                 evaluator=None, window_moves=None):
+        super().__init__(state, player, tt, deadline, stop, on_progress, evaluator, window_moves)
+        self.stats = stats
+        self.first_moves = {}  # ply -> first ordered move at the node being searched there
+
+    def count_node(self):
+        self.stats.nodes += 1
+        super().count_node()
+
+    def make(self, m, p):
+        start = time.perf_counter()
+        super().make(m, p)
+        self.stats.update_time += time.perf_counter() - start
+
+    def unmake(self, m, p):
+        start = time.perf_counter()
+        super().unmake(m, p)
+        self.stats.update_time += time.perf_counter() - start
+
+    def chance_value(self, alpha, beta, depth, ply, schedule):
+        if len(redraw_outcomes(schedule, depth)) > 1:
+            self.stats.chance_nodes += 1
+        return super().chance_value(alpha, beta, depth, ply, schedule)
+
+    def evaluate(self):
+        start = time.perf_counter()
+        value = super().evaluate()
+        self.stats.eval_time += time.perf_counter() - start
+        self.stats.evaluations += 1
+        return value
+
+    def probe(self, key, alpha, beta, depth):
+        value, move = super().probe(key, alpha, beta, depth)
+        stats = self.stats
+        stats.tt_probes += 1
+        if move is not None:
+            stats.tt_hits += 1
+        if value is not None:
+            stats.tt_cutoffs += 1
+        return value, move
+
+    def ordered_moves(self, ply, depth, mover, tt_move, schedule=None):
+        start = time.perf_counter()
+        moves = super().ordered_moves(ply, depth, mover, tt_move, schedule)
+        self.stats.movegen_time += time.perf_counter() - start
+        self.stats.expanded += 1
+        self.first_moves[ply] = None
+        return self.timed_moves(ply, moves)
+
+    def timed_moves(self, ply, moves):
+        """Pass moves through, timing how long each takes to produce"""
+        stats = self.stats
+        moves = iter(moves)
+        while True:
+            start = time.perf_counter()
+            m = next(moves, None)
+            stats.movegen_time += time.perf_counter() - start
+            if m is None:
+                return
+            if self.first_moves[ply] is None:
+                self.first_moves[ply] = m
+            yield m
+
+    def cutoff(self, ply, depth, mover, m):
+        self.stats.cutoffs += 1
+        if m == self.first_moves.get(ply):
+            self.stats.first_move_cutoffs += 1
+        super().cutoff(ply, depth, mover, m)
+
+
+def alpha_beta_search(state, depth, player, tt=None):
+    """Alpha-Beta pruning to find best move, optionally with a transposition table"""
+    if tt is not None:
+        tt.new_search()
+    _, pv = AlphaBeta(state, player, tt).search(depth)
+    return state.board.cell(pv[0]) if pv else None
+
+TIME_MARGIN = 0.05  # Share of a time budget kept back for unwinding the search
+
+def iterative_deepening(state, player, time_ms=None, max_depth=None, tt=None,
+                        stop=None, on_progress=None, stats=None, evaluator=None,
+                        window_moves=None):
+    """Search depth 1, 2, ... until max_depth or the time budget runs out.
+
+    Returns the best move of the deepest completed iteration. The search
+    stops TIME_MARGIN short of the budget, so that the move comes back
+    within it. Depth 1 is always completed so there is a move even with
+    a tiny budget; setting stop cancels the search outright and may
+    return None. on_progress gets the depth and the nodes so far after
+    every depth and once more as the search ends. Pass a
+    SearchStats to have the search counted and timed into it, an
+    evaluator to search with it instead of the shortest-path evaluation,
+    and window_moves to change the large-board move cut of AlphaBeta.
+    """
+    start = time.perf_counter()
+    if max_depth is None:
+        max_depth = bin(state.board.empty_mask()).count("1")
+    if tt is not None:
+        tt.new_search()
+    if stats is None:
+        search = AlphaBeta(state, player, tt, stop=stop, on_progress=on_progress,
+                           evaluator=evaluator, window_moves=window_moves)
+    else:
+        search = InstrumentedAlphaBeta(state, player, stats, tt, stop=stop, on_progress=on_progress,
+                                       evaluator=evaluator, window_moves=window_moves)
+    best = None
+    for depth in range(1, max_depth + 1):
+        iteration_start = time.perf_counter()
+        nodes_before = search.nodes
+        try:
+            value, pv = search.search(depth)
+        except SearchTimeout:
+            break
+        if pv:
+            best = pv[0]
+        if stats is not None:
+            stats.pv = [state.board.cell(m) for m in pv]
+            stats.iterations.append({"depth": depth, "nodes": search.nodes - nodes_before,
+                                     "seconds": time.perf_counter() - iteration_start,
+                                     "value": value, "pv": stats.pv})
+        if on_progress is not None:
+            on_progress(depth, search.nodes)
+        if abs(value) > FORCED_SCORE:
+            break  # Forced result found, deeper search cannot change it
+        if time_ms is not None:
+            search.deadline = start + time_ms * (1 - TIME_MARGIN) / 1000
+            if time.perf_counter() >= search.deadline:
+                break
+    if on_progress is not None:
+        on_progress(search.depth, search.nodes)  # Final count, unfinished iteration included
+    return None if best is None else state.board.cell(best)
+
+
+class Engine:
+    """AI player that picks moves for a GameState
+
+    With time_ms set the engine deepens iteratively until the budget is
+    spent (up to depth, if given); otherwise it searches exactly depth.
+    With workers set, each iteration is a parallel root search across
+    that many processes (see hex_parallel); call close() when done.
+    algorithm="mcts" plays with Monte Carlo Tree Search instead (see
+    hex_mcts), limited by playouts and/or time_ms; it only searches for
+    the player to move and raises ValueError for anyone else.
+
+    For the serial Alpha-Beta search, stats_hook is called with a
+    SearchStats after every move and stats_log names a file that gets
+    one JSON line per move. profile names a file that receives cProfile
+    statistics of every choose_move call so far (read it with pstats).
+
+    Once at most endgame_cells cells are empty the engine first tries to
+    prove a win with the exact solver in hex_solver, and plays the proven
+    move if it finds one; otherwise it searches as usual. A failed proof
+    adds its cost to the move: solver_nodes nodes, each about as dear
+    as a few Alpha-Beta nodes. The budget defaults to SOLVER_NODES with
+    a time budget, which also stops the proof after half of time_ms,
+    and to SOLVER_NODES_PER_DEPTH per ply of depth without one, so a
+    shallow engine is not slowed by a deep proof attempt.
+    endgame_cells=0 turns this off.
+
+    last_nodes holds the nodes the last choose_move searched: Alpha-Beta
+    nodes in every process plus those of the endgame solver. It is 0 for
+    a book move, and MCTS playouts do not count.
+
+    book names an opening book file (see hex_book); it is memory-mapped
+    once here if it exists, and a position found in it is answered
+    without searching. book=None turns it off.
+
+    evaluator="resistance" makes the serial Alpha-Beta search score
+    positions with the electrical-resistance model of hex_resistance
+    (needs NumPy) instead of the shortest path lengths; its cache of
+    solved positions is kept across moves.
+
+    window_moves sets how many moves per node the Alpha-Beta search
+    keeps on boards above AlphaBeta.WINDOW_CELLS cells (WINDOW_MOVES by
+    default). Fewer is faster but may miss the best move.
+    """
+
+    SOLVER_NODES = 2000  # Endgame proof budget with a time budget
+    SOLVER_NODES_PER_DEPTH = 25  # Endgame proof budget per ply of a fixed-depth search
+
+    def __init__(self, depth=4, tt_mb=16, time_ms=None, workers=None,
+                 algorithm="alphabeta", playouts=None, stats_hook=None,
+                 stats_log=None, profile=None, endgame_cells=16, solver_nodes=None,
+                 book=BOOK_FILE, evaluator=None, window_moves=None):
+        self.depth = depth  # Adjust depth based on performance
+        self.time_ms = time_ms  # Per-move budget in milliseconds
+        self.algorithm = algorithm  # "alphabeta" or "mcts"
+        self.playouts = playouts  # MCTS playout budget
+        self.tt = TranspositionTable(tt_mb)  # Kept across moves of a game
+        self.workers = workers
+        self.parallel = None
+        self.stats_hook = stats_hook
+        self.stats_log = stats_log
+        self.profile = profile
+        self.profiler = cProfile.Profile() if profile else None
+        self.endgame_cells = endgame_cells
+        self.solver_nodes = solver_nodes
+        self.window_moves = window_moves
+        self.last_nodes = 0  # Nodes the last choose_move searched
+        self.book = None
+        if book is not None and os.path.exists(book):
+            from hex_book import OpeningBook  # Imported lazily, it imports this module
+            self.book = OpeningBook(book)
+        self.evaluator = None
+        if evaluator == "resistance":
+            from hex_resistance import ResistanceEvaluator  # Imported lazily, it needs NumPy
+            self.evaluator = ResistanceEvaluator()
+        elif evaluator is not None:
+            raise ValueError(f"unknown evaluator {evaluator!r}")
+
+    def new_game(self):
+        """Forget cached search results from the previous game"""
+        self.tt.clear()
+
+    def choose_move(self, state, player=None, stop=None, on_progress=None):
+        """Return the move the AI would play, or None if there is none"""
+        if self.profiler is None:
+            return self.search_move(state, player, stop, on_progress)
+        self.profiler.enable()
+        try:
+            return self.search_move(state, player, stop, on_progress)
+        finally:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile)
+
+    def search_move(self, state, player, stop, on_progress):
+        self.last_nodes = 0
+        if player is None:
+            player = state.current_player()
+        if self.book is not None and player == state.current_player():
+            move = self.book.lookup(state)
+            if move is not None:
+                return move
+        start = time.perf_counter()
+        move = self.endgame_move(state, player, stop)
+        if move is not None:
+            return move
+        time_ms = self.time_ms
+        if time_ms is not None:
+            time_ms = max(time_ms - (time.perf_counter() - start) * 1000, 1)  # What the solver left
+        if self.algorithm == "mcts":
+            if player != state.current_player():
+                raise ValueError("MCTS only searches for the player to move")
+            from hex_mcts import mcts_search  # Imported lazily, it needs NumPy
+            return mcts_search(state, self.playouts, time_ms, stop=stop, on_progress=on_progress)
+        if self.workers:
+            return self.parallel_move(state, player, time_ms, stop, on_progress)
+        solver_nodes = self.last_nodes
+
+        def count(depth, nodes):
+            self.last_nodes = solver_nodes + nodes
+            if on_progress is not None:
+                on_progress(depth, nodes)
+
+        if self.stats_hook is None and self.stats_log is None:
+            return iterative_deepening(state, player, time_ms, self.depth, self.tt, stop,
+                                       count, evaluator=self.evaluator,
+                                       window_moves=self.window_moves)
+        stats = SearchStats()
+        start = time.perf_counter()
+        move = iterative_deepening(state, player, time_ms, self.depth, self.tt,
+                                   stop, count, stats, self.evaluator, self.window_moves)
+        stats.seconds = time.perf_counter() - start
+        stats.move = move
+        self.report(state, player, stats)
+        return move
+
+    def endgame_move(self, state, player, stop):
+        """Proven winning move near the end of the game, or None"""
+        if player != state.current_player() or state.game_over:
+            return None
+        if bin(state.board.empty_mask()).count("1") > self.endgame_cells:
+            return None
+        from hex_solver import EndgameSolver  # Imported lazily, it imports this module
+        nodes = self.solver_nodes
+        deadline = None
+        if self.time_ms is not None:
+            deadline = time.perf_counter() + self.time_ms / 2000
+            nodes = nodes or self.SOLVER_NODES
+        elif nodes is None:
+            nodes = self.SOLVER_NODES_PER_DEPTH * self.depth if self.depth else self.SOLVER_NODES
+        solver = EndgameSolver(state, nodes, deadline=deadline, stop=stop)
+        proven = solver.prove(player)
+        self.last_nodes += solver.nodes
+        if proven:
+            return solver.winning_move(player)
+        return None
+
+    def report(self, state, player, stats):
+        """Hand a move's statistics to the hook and the JSON-lines log"""
+        if self.stats_hook is not None:
+            self.stats_hook(stats)
+        if self.stats_log is not None:
+            record = {"rows": state.rows, "cols": state.cols, "player": player,
+                      "empty": bin(state.board.empty_mask()).count("1"),
+                      "depth": self.depth, "time_ms": self.time_ms}
+            record.update(stats.to_dict())
+            with open(self.stats_log, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def parallel_move(self, state, player, time_ms, stop=None, on_progress=None):
+        """Iterative deepening where every depth is a parallel root search
+
+        Each depth searches the best move of the one before first, and
+        the workers keep their tables from depth to depth. Setting stop
+        cancels it outright (returning None), between depths or within
+        one; on_progress(depth, nodes) counts the nodes of the depth in
+        progress across all processes.
+        """
+        if self.parallel is None:
+            from hex_parallel import ParallelSearch  # Imported lazily, it starts processes
+            self.parallel = ParallelSearch(self.workers)
+        start = time.perf_counter()
+        max_depth = self.depth or bin(state.board.empty_mask()).count("1")
+        best = None
+        for depth in range(1, max_depth + 1):
+            if stop is not None and stop.is_set():
+                return None
+            left_ms = None
+            if time_ms is not None and best is not None:
+                left_ms = time_ms - (time.perf_counter() - start) * 1000
+                if left_ms <= 0:
+                    break
+            move, value = self.parallel.search(state, depth, player, left_ms, self.window_moves,
+                                               stop, on_progress, first=best)
+            self.last_nodes += self.parallel.nodes
+            if stop is not None and stop.is_set():
+                return None
+            if value is None:
+                break  # Out of time, keep the last completed depth's move
+            best = move
+            if best is None or abs(value) > FORCED_SCORE:
+                break
+        return best
+
+    def close(self):
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
@@ -0,0 +1,305 @@
+"""Long-running Hex engine speaking a GTP-style text protocol.
+
+    python hex_gtp.py --depth 4
+    python hex_gtp.py --time-ms 2000 --port 6000
+
+Commands are read one per line from stdin, or from each client of a
+local TCP socket with --port, and answered GTP style: "= result" or
+"? error", then a blank line; a command may start with a numeric id that
+is echoed back. Over a socket, quit only ends that client's connection
+and the warm engine waits for the next one. Vertices are a column letter and a 1-based row number,
+so "c5" is row 4, column 2. Colors are red (moves first, also black or
+b) and blue (white or w).
+
+    boardsize N [M]     new empty N x M board (square if M is left out)
+    clear_board         remove all stones, keeping obstacles and bonus seed
+    obstacle V...       add obstacles; only on a board without stones
+    bonus_seed S        replay the bonus draws of seed S (see hex_records)
+    play COLOR V        place a stone; COLOR must be the player to move
+    genmove COLOR       let the engine move for COLOR and print the vertex
+    undo                take back the last stone
+    showboard           print the board
+
+The bonus-move counter is drawn at random, so a controller that keeps its
+own GameState should share the bonus seed through bonus_seed.
+
+One Engine lives for the whole session, so its transposition table stays
+warm from move to move and is only cleared by boardsize and clear_board.
+After each genmove the engine ponders on the opponent's time: it guesses
+the reply with a shallow search and searches its answer to that reply in
+a background thread. If the next play is the guessed move, the following
+genmove takes over that search, finished or still running; any other
+command cancels it, and its table entries are still there to help.
+"""
+import argparse
+import socket
+import sys
+import threading
+
+from hex_engine import (BLUE, COLS, MAX_BOARD_SIZE, RED, ROWS, Engine, GameState,
+                        iterative_deepening)
+
+COLORS = {"red": RED, "r": RED, "black": RED, "b": RED,
+          "blue": BLUE, "white": BLUE, "w": BLUE}
+COLOR_NAMES = ["red", "blue"]
+QUERIES = {"protocol_version", "name", "version", "known_command", "list_commands",
+           "showboard"}  # Commands that leave a ponder search running
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+class GtpError(Exception):
+    """A command failed; the message is sent back to the controller"""
+
+
+class Ponder:
+    """Search of the engine's answer to the opponent's expected reply"""
+
+    PREDICT_DEPTH = 2  # Depth of the search that guesses the reply
+
+    def __init__(self, engine, state, player):
+        self.stop = threading.Event()
+        self.guess = None  # Reply searched against, set once the guess is made
+        self.move = None  # Engine's answer, set if the search finishes
+        self.thread = threading.Thread(target=self.run, args=(engine, state.copy(), player),
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self, engine, state, player):
+        guess = iterative_deepening(state, state.current_player(), max_depth=self.PREDICT_DEPTH,
+                                    tt=engine.tt, stop=self.stop)
+        if guess is None or self.stop.is_set():
+            return
+        state.play(guess)
+        if state.game_over or state.current_player() != player:
+            return  # The opponent moves again after a bonus; nothing to answer yet
+        self.guess = guess
+        move = engine.choose_move(state, player, stop=self.stop)
+        if not self.stop.is_set():
+            self.move = move
+
+    def cancel(self):
+        self.stop.set()
+        self.thread.join()
+
+
+class GtpEngine:
+    """Game state, engine and ponder search behind one protocol session"""
+
+    def __init__(self, ponder=True, **engine_options):
+        self.engine = Engine(**engine_options)
+        self.pondering = ponder
+        self.ponder = None
+        self.ponder_hit = False  # The last play was the move the ponder search guessed
+        self.color = None  # Color of the last genmove, the side pondered for
+        self.quit = False
+        self.new_board(ROWS, COLS)
+
+    def new_board(self, rows, cols):
+        self.state = GameState(rows, cols, obstacles=())
+        self.history = []  # States before each stone, for undo
+        self.engine.new_game()
+
+    def handle(self, line):
+        """Response text for one command line, or None for a blank line"""
+        words = line.split("#", 1)[0].split()
+        if not words:
+            return None
+        command_id = words.pop(0) if words[0].isdigit() else ""
+        if not words:
+            return f"?{command_id} missing command\n\n"
+        name, args = words[0].lower(), words[1:]
+        handler = getattr(self, "cmd_" + name, None)
+        if handler is None:
+            return f"?{command_id} unknown command\n\n"
+        if name not in QUERIES and name != "play" and name != "genmove":
+            self.stop_ponder()  # play and genmove decide for themselves
+        try:
+            result = handler(args)
+        except GtpError as error:
+            return f"?{command_id} {error}\n\n"
+        self.start_ponder()
+        return f"={command_id} {result or ''}".rstrip() + "\n\n"
+
+    def stop_ponder(self):
+        if self.ponder is not None:
+            self.ponder.cancel()
+            self.ponder = None
+        self.ponder_hit = False
+
+    def start_ponder(self):
+        state = self.state
+        if (not self.pondering or self.ponder is not None or self.color is None
+                or state.game_over or state.current_player() == self.color):
+            return
+        self.ponder = Ponder(self.engine, state, self.color)
+
+    def parse_color(self, word):
+        color = COLORS.get(word.lower())
+        if color is None:
+            raise GtpError(f"invalid color {word}")
+        return color
+
+    def parse_vertex(self, word):
+        letter, number = word[:1].lower(), word[1:]
+        if letter not in LETTERS or not number.isdigit():
+            raise GtpError(f"invalid vertex {word}")
+        row, col = int(number) - 1, LETTERS.index(letter)
+        if not (0 <= row < self.state.rows and 0 <= col < self.state.cols):
+            raise GtpError(f"vertex {word} is off the board")
+        return row, col
+
+    def format_vertex(self, move):
+        row, col = move
+        return f"{LETTERS[col]}{row + 1}"
+
+    def check_turn(self, color):
+        if self.state.game_over:
+            raise GtpError("game is over")
+        if color != self.state.current_player():
+            raise GtpError(f"it is {COLOR_NAMES[self.state.current_player()]}'s turn")
+
+    def play(self, move):
+        self.history.append(self.state.copy())
+        self.state.play(move)
+
+    def cmd_protocol_version(self, args):
+        return "2"
+
+    def cmd_name(self, args):
+        return "AI-Hex"
+
+    def cmd_version(self, args):
+        return "1"
+
+    def cmd_known_command(self, args):
+        return "true" if args and hasattr(self, "cmd_" + args[0].lower()) else "false"
+
+    def cmd_list_commands(self, args):
+        return "\n".join(sorted(name[4:] for name in dir(self) if name.startswith("cmd_")))
+
+    def cmd_quit(self, args):
+        self.quit = True
+
+    def cmd_boardsize(self, args):
+        try:
+            rows = int(args[0])
+            cols = int(args[1]) if len(args) > 1 else rows
+        except (IndexError, ValueError):
+            raise GtpError("boardsize needs one or two numbers")
+        if not (2 <= rows <= MAX_BOARD_SIZE and 2 <= cols <= MAX_BOARD_SIZE):
+            raise GtpError(f"unacceptable size, at most {MAX_BOARD_SIZE}")
+        self.new_board(rows, cols)
+
+    def cmd_clear_board(self, args):
+        self.state.restart(new_obstacles=False, bonus_seed=self.state.bonus_seed)
+        self.history = []
+        self.engine.new_game()
+
+    def cmd_obstacle(self, args):
+        if self.state.moves:
+            raise GtpError("obstacles go on a board without stones")
+        cells = {self.parse_vertex(word) for word in args}
+        self.state.obstacles |= cells
+        self.state.restart(new_obstacles=False, bonus_seed=self.state.bonus_seed)
+
+    def cmd_bonus_seed(self, args):
+        if self.state.moves:
+            raise GtpError("the bonus seed is set on a board without stones")
+        if not args or not args[0].isdigit():
+            raise GtpError("bonus_seed needs a number")
+        self.state.restart(new_obstacles=False, bonus_seed=int(args[0]))
+
+    def cmd_play(self, args):
+        if len(args) != 2:
+            raise GtpError("play needs a color and a vertex")
+        color, move = self.parse_color(args[0]), self.parse_vertex(args[1])
+        self.check_turn(color)
+        if not self.state.is_valid_move(move):
+            raise GtpError("illegal move")
+        hit = self.ponder is not None and self.ponder.guess == move
+        if not hit:
+            self.stop_ponder()
+        self.play(move)
+        self.ponder_hit = hit
+
+    def cmd_genmove(self, args):
+        if len(args) != 1:
+            raise GtpError("genmove needs a color")
+        color = self.parse_color(args[0])
+        self.check_turn(color)
+        move = None
+        if self.ponder_hit and color == self.color:
+            self.ponder.thread.join()  # The search of this very position
+            move = self.ponder.move
+            self.ponder = None
+        self.stop_ponder()
+        if move is None:
+            move = self.engine.choose_move(self.state, color)
+        self.color = color
+        if move is None:
+            return "resign"
+        self.play(move)
+        return self.format_vertex(move)
+
+    def cmd_undo(self, args):
+        if not self.history:
+            raise GtpError("cannot undo")
+        self.state = self.history.pop()
+
+    def cmd_showboard(self, args):
+        state = self.state
+        lines = ["   " + " ".join(LETTERS[:state.cols])]
+        for row in range(state.rows):
+            cells = []
+            for col in range(state.cols):
+                owner = state.owner((row, col))
+                if (row, col) in state.obstacles:
+                    cells.append("#")
+                else:
+                    cells.append("." if owner is None else "RB"[owner])
+            lines.append(f"{row + 1:2d} " + " ".join(cells))
+        lines.append(f"{COLOR_NAMES[state.current_player()]} to move")
+        return "\n" + "\n".join(lines)
+
+    def close(self):
+        self.stop_ponder()
+        self.engine.close()
+
+
+# Function to answer commands from one text stream until quit or end of input
+def serve(session, infile, outfile):
+    session.quit = False
+    for line in infile:
+        response = session.handle(line)
+        if response is None:
+            continue
+        outfile.write(response)
+        outfile.flush()
+        if session.quit:
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description="Hex engine over a GTP-style protocol")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--time-ms", type=int, help="per-move budget; deepens iteratively")
+    parser.add_argument("--tt-mb", type=int, default=16)
+    parser.add_argument("--no-ponder", action="store_true", help="stay idle on the opponent's time")
+    parser.add_argument("--port", type=int, help="serve clients on this local TCP port instead of stdin")
+    args = parser.parse_args()
+
+    session = GtpEngine(ponder=not args.no_ponder, depth=args.depth,
+                        time_ms=args.time_ms, tt_mb=args.tt_mb)
+    try:
+        if args.port is None:
+            serve(session, sys.stdin, sys.stdout)
+            return
+        with socket.create_server(("127.0.0.1", args.port)) as server:
+            while True:
+                conn, _ = server.accept()
+                with conn, conn.makefile("r") as infile, conn.makefile("w") as outfile:
+                    serve(session, infile, outfile)
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Monte Carlo Tree Search engine with RAVE and batched NumPy playouts.
+
+Each tree iteration selects a leaf with UCT-RAVE, expands one move and
+then plays a whole batch of random games from it at once: every playout
+is a random order of the remaining empty cells, the movers follow the
+bonus-move rule, and the winner is found with a vectorized flood fill
+over all playouts together. Obstacles are never filled. A finished Hex
+board can only contain one winning chain, so filling the board and
+checking the end result gives the same winner as stopping at the first
+connection.
+
+Counter redraws after bonus moves come from the search's own generator,
+in the tree as in the playouts. The game's generator, which every
+GameState copy clones, holds the future draws that no player can know.
+"""
+import math
+import time
+
+import numpy as np
+
+from hex_engine import RED, BLUE, iter_bits
+
+EMPTY, RED_STONE, BLUE_STONE, OBSTACLE = 0, 1, 2, 3
+
+
+class PlayoutBoard:
+    """NumPy tables for one board size: neighbor indices and edge masks"""
+
+    def __init__(self, geometry):
+        self.size = geometry.size
+        # Pad every neighbor list to six entries with a sentinel column
+        self.neighbors = np.full((self.size, 6), self.size, dtype=np.intp)
+        for i, nbrs in enumerate(geometry.neighbors):
+            self.neighbors[i, :len(nbrs)] = nbrs
+        self.start = [self.mask(geometry.start_cells[p]) for p in (RED, BLUE)]
+        self.end = [self.mask(geometry.end_cells[p]) for p in (RED, BLUE)]
+
+    def mask(self, cells):
+        m = np.zeros(self.size, dtype=bool)
+        m[cells] = True
+        return m
+
+    def connected(self, stones, player):
+        """Which rows of a (batch, cells) bool array join the player's edges"""
+        reach = stones & self.start[player]
+        pad = np.zeros((stones.shape[0], 1), dtype=bool)
+        while True:
+            grown = np.concatenate((reach, pad), axis=1)[:, self.neighbors].any(axis=2)
+            grown &= stones
+            grown |= reach
+            if np.array_equal(grown, reach):
+                return (reach & self.end[player]).any(axis=1)
+            reach = grown
+
+
+def board_array(state):
+    board = state.board
+    cells = np.zeros(board.geometry.size, dtype=np.int8)
+    for player, value in ((RED, RED_STONE), (BLUE, BLUE_STONE)):
+        cells[list(iter_bits(board.stones[player]))] = value
+    cells[list(iter_bits(board.obstacle_mask))] = OBSTACLE
+    return cells
+
+def mover_sequences(state, batch, length, rng):
+    """(batch, length) array of the players placing each remaining stone"""
+    turn = np.full(batch, state.turn, dtype=np.int8)
+    active = np.full(batch, state.bonus_move_active)
+    bonus_player = np.full(batch, -1 if state.bonus_player is None else state.bonus_player, dtype=np.int8)
+    counter = np.full(batch, state.bonus_move_counter, dtype=np.int64)
+    move_count = np.full(batch, state.move_count, dtype=np.int64)
+    movers = np.empty((batch, length), dtype=np.int8)
+    for k in range(length):
+        movers[:, k] = np.where(active, bonus_player, turn)
+        # Bonus move played: redraw the counter and hand the turn over
+        ended = active.copy()
+        counter[ended] = rng.integers(1, 6, size=int(ended.sum()))
+        turn[ended] = 1 - bonus_player[ended]
+        # Regular move: count it and maybe grant a bonus
+        regular = ~ended
+        move_count[regular] += 1
+        bonus = regular & (move_count % counter == 0)
+        bonus_player[bonus] = turn[bonus]
+        switch = regular & ~bonus
+        turn[switch] = 1 - turn[switch]
+        active = bonus
+    return movers
+
+def playouts(state, tables, batch, rng):
+    """Fill the board randomly batch times; returns (final cells, winners)
+
+    Winners are RED, BLUE or -1 for a draw (obstacles can block both).
+    """
+    cells = np.tile(board_array(state), (batch, 1))
+    empties = np.flatnonzero(cells[0] == EMPTY)
+    if len(empties):
+        order = empties[np.argsort(rng.random((batch, len(empties))), axis=1)]
+        movers = mover_sequences(state, batch, len(empties), rng)
+        cells[np.arange(batch)[:, None], order] = movers + 1
+    winners = np.full(batch, -1, dtype=np.int8)
+    winners[tables.connected(cells == BLUE_STONE, BLUE)] = BLUE
+    winners[tables.connected(cells == RED_STONE, RED)] = RED
+    return cells, winners
+
+
+class Node:
+    """Search tree node; statistics are from the view of the player who moved into it"""
+
+    def __init__(self, state, move=None, parent=None):
+        self.state = state
+        self.move = move
+        self.parent = parent
+        self.mover = state.current_player()  # Player to move here
+        self.children = {}
+        self.untried = [] if state.game_over else list(iter_bits(state.board.empty_mask()))
+        self.visits = 0
+        self.wins = 0.0
+        size = state.board.geometry.size
+        self.amaf_visits = np.zeros(size)  # RAVE statistics of this node's moves
+        self.amaf_wins = np.zeros(size)
+
+
+class MCTS:
+    """UCT with RAVE; keeps the tree for a single root position"""
+
+    PROGRESS_EVERY = 1024  # Playouts between progress reports
+
+    def __init__(self, state, batch_size=64, exploration=0.4, rave_bias=300, seed=None):
+        self.root = Node(state.copy())
+        self.tables = PlayoutBoard(state.board.geometry)
+        self.batch_size = batch_size
+        self.exploration = exploration
+        self.rave_bias = rave_bias  # Larger values trust RAVE statistics for longer
+        self.rng = np.random.default_rng(seed)
+        self.playouts = 0
+        self.depth = 0  # Deepest tree node reached so far
+
+    def score(self, parent, child, log_visits):
+        m = child.move
+        q = child.wins / child.visits
+        amaf_n = parent.amaf_visits[m]
+        if amaf_n:
+            beta = amaf_n / (amaf_n + child.visits + child.visits * amaf_n / self.rave_bias)
+            q = (1 - beta) * q + beta * parent.amaf_wins[m] / amaf_n
+        return q + self.exploration * math.sqrt(log_visits / child.visits)
+
+    def select(self):
+        node = self.root
+        path = [node]
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            parent = node
+            node = max(parent.children.values(), key=lambda c: self.score(parent, c, log_visits))
+            path.append(node)
+        if node.untried:
+            # Expand the untried move with the best RAVE estimate so far
+            m = max(node.untried, key=lambda m: (node.amaf_wins[m] + 1) / (node.amaf_visits[m] + 2))
+            node.untried.remove(m)
+            state = node.state.copy()
+            bonus = state.bonus_move_active
+            state.play(state.board.cell(m))
+            if bonus and not state.game_over:
+                # Not the copied game generator's redraw: sample it like the playouts do
+                state.bonus_move_counter = int(self.rng.integers(1, 6))
+            child = Node(state, m, node)
+            node.children[m] = child
+            path.append(child)
+        self.depth = max(self.depth, len(path) - 1)
+        return path
+
+    def iterate(self):
+        path = self.select()
+        leaf = path[-1]
+        batch = self.batch_size
+        if leaf.state.game_over:
+            winners = np.full(batch, -1 if leaf.state.winner is None else leaf.state.winner)
+            cells = None
+        else:
+            cells, winners = playouts(leaf.state, self.tables, batch, self.rng)
+        red_wins = float((winners == RED).sum())
+        blue_wins = float((winners == BLUE).sum())
+        draws = batch - red_wins - blue_wins
+        for node in path:
+            node.visits += batch
+            if node.parent is not None:
+                mover = node.parent.mover
+                node.wins += (red_wins if mover == RED else blue_wins) + 0.5 * draws
+            if cells is not None:
+                # All moves as first: credit every cell the mover ended up owning
+                owned = cells == node.mover + 1
+                won = (winners == node.mover)[:, None]
+                node.amaf_visits += owned.sum(axis=0)
+                node.amaf_wins += (owned & won).sum(axis=0)
+        self.playouts += batch
+
+    def search(self, playouts=None, time_ms=None, stop=None, on_progress=None):
+        """Run until the playout or time budget is spent; returns the best (row, col)
+
+        stop is checked after every batch; once it is set the search is
+        abandoned and returns None. on_progress(depth, playouts) is
+        called every PROGRESS_EVERY playouts with the deepest tree node
+        so far.
+        """
+        if not self.root.untried and not self.root.children:
+            return None
+        if playouts is None and time_ms is None:
+            playouts = 10000
+        deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000
+        next_progress = self.playouts + self.PROGRESS_EVERY
+        while True:
+            self.iterate()
+            if stop is not None and stop.is_set():
+                return None
+            if on_progress is not None and self.playouts >= next_progress:
+                on_progress(self.depth, self.playouts)
+                next_progress = self.playouts + self.PROGRESS_EVERY
+            if playouts is not None and self.playouts >= playouts:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        best = max(self.root.children.values(), key=lambda c: c.visits)
+        return self.root.state.board.cell(best.move)
+
+
+def mcts_search(state, playouts=None, time_ms=None, batch_size=64, seed=None, stop=None,
+                on_progress=None):
+    """Pick a move for the player to move with MCTS; the budget defaults to 10000 playouts"""
+    return MCTS(state, batch_size, seed=seed).search(playouts, time_ms, stop, on_progress)
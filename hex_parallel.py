@@ -0,0 +1,221 @@
+"""Parallel root search for the Hex AI across a process pool.
+
+The root moves are split Young Brothers Wait style: the eldest (first
+ordered) move is searched in the calling process to get a bound, then
+the younger brothers are searched by pool workers. A shared alpha is
+raised whenever a worker finishes with a better value, and every new
+task starts from the latest one. Each child is searched with a window
+just below the shared alpha, so ties are resolved exactly and the
+chosen move is the first best move in root order: the same answer as
+a serial fixed-depth alpha_beta_search.
+
+A search is cancelled through a stop object in the calling process.
+The workers cannot see that object, so the caller publishes the id of
+the cancelled search in shared memory and every worker search checks
+it with its clock.
+
+Run this module directly for a speedup-versus-workers benchmark.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from hex_engine import (AlphaBeta, GameState, SearchTimeout, TranspositionTable,
+                        alpha_beta_search)
+
+TIE_MARGIN = 1e-6  # Window below alpha so equal values come back exact
+STOP_POLL_SECONDS = 0.01  # How often the caller checks its stop object while workers search
+
+# Per worker process state
+_shared_alpha = None
+_cancelled = None
+_worker_tt = None
+_worker_root = None  # Root position the worker's table holds entries for
+
+def _init_worker(shared_alpha, cancelled, tt_mb):
+    global _shared_alpha, _cancelled, _worker_tt
+    _shared_alpha = shared_alpha
+    _cancelled = cancelled
+    _worker_tt = TranspositionTable(tt_mb) if tt_mb else None
+
+
+class _SearchStop:
+    """Event-like stop flag: set once the caller cancels this search or a later one"""
+
+    def __init__(self, search_id):
+        self.search_id = search_id
+
+    def is_set(self):
+        return _cancelled.value >= self.search_id
+
+def _search_child(search_id, state, player, move, depth, wall_deadline, window_moves=None):
+    """Search one root move; returns (value, exact, nodes), value None on timeout
+
+    The worker's table is kept while the root stays the same, so the
+    depths of one iterative deepening build on each other.
+    """
+    global _worker_root
+    root = (state.board.hash, player)
+    if _worker_tt is not None and root != _worker_root:
+        _worker_tt.clear()  # Entries from another root would skew depths
+        _worker_tt.new_search()
+        _worker_root = root
+    deadline = None
+    if wall_deadline is not None:
+        deadline = time.perf_counter() + (wall_deadline - time.time())
+    search = AlphaBeta(state, player, _worker_tt, deadline=deadline, stop=_SearchStop(search_id),
+                       window_moves=window_moves)
+    search.depth = depth
+    alpha = _shared_alpha.value - TIE_MARGIN
+    search.make(move, player)
+    try:
+        value = search.win_value(player, depth, search.schedule)
+        if value is None:
+            value, _ = search.after_move(alpha, float('inf'), depth - 1, 1, search.schedule)
+    except SearchTimeout:
+        return None, False, search.nodes
+    exact = value > alpha
+    if exact:
+        with _shared_alpha.get_lock():
+            if value > _shared_alpha.value:
+                _shared_alpha.value = value
+    return value, exact, search.nodes
+
+
+class ParallelSearch:
+    """Pool of search processes reused across moves"""
+
+    def __init__(self, workers=None, tt_mb=16):
+        self.workers = workers or os.cpu_count() or 1
+        ctx = multiprocessing.get_context("spawn")
+        self.shared_alpha = ctx.Value("d", float('-inf'))
+        self.cancelled = ctx.Value("q", 0, lock=False)  # Searches up to this id are cancelled
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker,
+                                        initargs=(self.shared_alpha, self.cancelled, tt_mb))
+        self.search_id = 0
+        self.nodes = 0  # Nodes searched so far by the last search, in all processes
+
+    def search(self, state, depth, player, time_ms=None, window_moves=None, stop=None,
+               on_progress=None, first=None):
+        """Fixed-depth search; returns (move, value)
+
+        move is None if there is no move, with the value -inf, and both
+        are None if time ran out or stop was set.
+
+        on_progress(depth, nodes) is called as root moves finish. first
+        is a move to search first, such as the best move of the previous
+        depth.
+        """
+        self.search_id += 1
+        self.nodes = 0
+        wall_deadline = None if time_ms is None else time.time() + time_ms / 1000
+        root = AlphaBeta(state, player, stop=stop, window_moves=window_moves)
+        if first is not None:
+            root.pv = [state.board.index(*first)]  # Ordered ahead of every other move
+        moves = root.ordered_moves(0, depth, player, None)
+        if not moves:
+            return None, float('-inf')
+
+        # Eldest brother first, in this process
+        eldest = moves[0]
+        if wall_deadline is not None:
+            root.deadline = time.perf_counter() + (wall_deadline - time.time())
+        root.depth = depth
+        root.make(eldest, player)
+        try:
+            best_value = root.win_value(player, depth, root.schedule)
+            if best_value is None:
+                best_value, _ = root.after_move(float('-inf'), float('inf'), depth - 1, 1, root.schedule)
+        except SearchTimeout:
+            self.nodes = root.nodes
+            return None, None
+        root.unmake(eldest, player)
+        self.nodes = root.nodes
+        if on_progress is not None:
+            on_progress(depth, self.nodes)
+        results = {0: best_value}
+        self.shared_alpha.value = best_value
+
+        # Younger brothers in parallel, until they are done or stop is set
+        futures = {self.pool.submit(_search_child, self.search_id, state, player, m,
+                                    depth, wall_deadline, window_moves): i
+                   for i, m in enumerate(moves[1:], 1)}
+        pending = set(futures)
+        timed_out = False
+        while pending:
+            if stop is not None and stop.is_set():
+                self.cancelled.value = self.search_id
+                for future in pending:
+                    future.cancel()
+                return None, None
+            done, pending = wait(pending, STOP_POLL_SECONDS, FIRST_COMPLETED)
+            for future in done:
+                value, exact, nodes = future.result()
+                self.nodes += nodes
+                if value is None:
+                    timed_out = True
+                elif exact:
+                    results[futures[future]] = value
+            if done and on_progress is not None:
+                on_progress(depth, self.nodes)
+        if timed_out:
+            return None, None
+
+        # First move in root order with the best value, as the serial search picks
+        best_value = max(results.values())
+        best = min(i for i, v in results.items() if v == best_value)
+        return state.board.cell(moves[best]), best_value
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def parallel_alpha_beta_search(state, depth, player, workers=None):
+    """One-off parallel search; returns the move like alpha_beta_search()"""
+    searcher = ParallelSearch(workers)
+    try:
+        move, _ = searcher.search(state, depth, player)
+        return move
+    finally:
+        searcher.close()
+
+
+# Function to set up a reproducible benchmark position
+def benchmark_position(size, stones, seed):
+    rng = random.Random(seed)
+    state = GameState(size, size, seed=seed)
+    for _ in range(stones):
+        state.play(rng.choice(state.get_valid_moves()))
+    return state
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel search speedup benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 11])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--stones", type=int, default=6, help="random stones placed before searching")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        state = benchmark_position(size, args.stones, args.seed)
+        player = state.current_player()
+        start = time.perf_counter()
+        serial_move = alpha_beta_search(state, args.depth, player)
+        serial_time = time.perf_counter() - start
+        print(f"{size}x{size} depth {args.depth}: serial {serial_time:.2f}s move {serial_move}")
+        for workers in args.workers:
+            searcher = ParallelSearch(workers)
+            searcher.search(state, 1, player)  # Warm up the pool processes
+            start = time.perf_counter()
+            move, _ = searcher.search(state, args.depth, player)
+            elapsed = time.perf_counter() - start
+            searcher.close()
+            same = "same move" if move == serial_move else f"DIFFERENT move {move}"
+            print(f"  {workers:2d} workers: {elapsed:.2f}s speedup {serial_time / elapsed:.2f}x ({same})")
+
+if __name__ == "__main__":
+    main()
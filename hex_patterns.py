@@ -0,0 +1,242 @@
+"""Local pattern tables for move ordering and dead-cell pruning.
+
+    python hex_patterns.py          # regenerate hex_patterns.bin
+
+Every cell carries two integer codes describing its surroundings. The
+ring code holds the six neighbors in clockwise order, one base-4 digit
+each: empty, red, blue or obstacle. The outer code holds the twelve
+cells two steps away, one base-3 digit each: red, blue or neither. The
+outer cells are the bridge cells, which share two neighbors with the
+cell, and the cells straight beyond each neighbor. A position off the
+board counts as a stone of the player whose edge it is, as in the
+engine's ring_types, so edge templates look like bridges to a stone. A
+corner position, off both edges, counts as empty.
+
+The codes index precomputed tables. For each player to move, the ring
+table scores saving an own bridge, cutting one of the opponent's,
+joining own groups or splitting the opponent's, and playing into an
+own intact bridge. The outer table scores forming bridges and blocking
+the opponent's. A further ring table flags dead cells, which are
+useless to both players. Its answers match the engine's is_dead, so
+dead-cell pruning becomes one lookup per empty cell.
+
+PatternCodes keeps the codes of one board up to date on make and
+unmake: a stone changes one digit in each of the 18 cells around it.
+The tables are generated once and saved zlib-compressed in
+hex_patterns.bin. They are rebuilt in memory if the file is missing.
+"""
+import argparse
+import os
+import struct
+import zlib
+from collections import namedtuple
+from functools import lru_cache
+
+from hex_engine import (BLOCKED, BLUE, EVEN_COL_DIRECTIONS, ODD_COL_DIRECTIONS, OPEN, OWN,
+                        RED, is_useless, iter_bits)
+
+PATTERN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hex_patterns.bin")
+MAGIC = b"HEXPATS"
+VERSION = 1
+HEADER = struct.Struct("<7sBII")  # magic, version, ring table size, outer table size
+
+EMPTY, OBSTACLE = 0, 3  # Ring digits; a player's stone is 1 + player
+RING_CODES = 4 ** 6
+OUTER_CODES = 3 ** 12
+
+PatternTables = namedtuple("PatternTables", "ring_priority outer_priority dead")
+
+
+# Function to step from (row, col) in one of the six directions
+def step(row, col, direction):
+    dr, dc = (ODD_COL_DIRECTIONS if col % 2 else EVEN_COL_DIRECTIONS)[direction]
+    return row + dr, col + dc
+
+def outer_positions(row, col):
+    """The twelve cells two steps away: bridge cell k lies between
+    neighbors k and k + 1, straight cell k beyond neighbor k"""
+    cells = []
+    for k in range(6):
+        r, c = step(row, col, k)
+        cells.append(step(r, c, (k + 1) % 6))
+        cells.append(step(r, c, k))
+    return cells
+
+# Function to get the fixed digit of a position off the board: its edge's player, or none at a corner
+def edge_digit(row, col, rows, cols):
+    off_rows = not 0 <= row < rows
+    off_cols = not 0 <= col < cols
+    if off_rows and off_cols:
+        return EMPTY
+    return 1 + (RED if off_rows else BLUE)
+
+
+class Neighborhoods:
+    """Per board size: code digits of the off-board positions, and for
+    every cell the codes it changes and by how much"""
+
+    def __init__(self, rows, cols):
+        size = rows * cols
+        self.ring_base = [0] * size  # Codes of an empty board
+        self.outer_base = [0] * size
+        self.ring_weights = [[] for _ in range(size)]  # cell -> [(cell around it, place value)]
+        self.outer_weights = [[] for _ in range(size)]
+        for row in range(rows):
+            for col in range(cols):
+                cell = row * cols + col
+                rings = [step(row, col, k) for k in range(6)]
+                for base, positions, weights, codes in (
+                        (4, rings, self.ring_weights, self.ring_base),
+                        (3, outer_positions(row, col), self.outer_weights, self.outer_base)):
+                    for place, (r, c) in enumerate(positions):
+                        value = base ** place
+                        if 0 <= r < rows and 0 <= c < cols:
+                            weights[r * cols + c].append((cell, value))
+                        else:
+                            codes[cell] += edge_digit(r, c, rows, cols) * value
+        # Changes made by a stone of each player; an obstacle only shows in the ring
+        self.ring_deltas = [[[(c, v * (1 + p)) for c, v in w] for w in self.ring_weights]
+                            for p in (RED, BLUE)]
+        self.outer_deltas = [[[(c, v * (1 + p)) for c, v in w] for w in self.outer_weights]
+                             for p in (RED, BLUE)]
+
+@lru_cache(maxsize=None)
+def board_neighborhoods(rows, cols):
+    return Neighborhoods(rows, cols)
+
+
+# Function to read a ring code as clockwise digits
+def ring_digits(code):
+    return [code >> (2 * k) & 3 for k in range(6)]
+
+def ring_score(digits, player):
+    """Priority of playing into a ring, before the offset"""
+    own, opp = 1 + player, 2 - player
+    score = 0
+    for k in range(6):
+        a, between, b = digits[k], digits[(k + 1) % 6], digits[(k + 2) % 6]
+        if a == b == own:
+            if between == opp:
+                score += 60  # Save an own bridge the opponent intruded into
+            elif between == EMPTY:
+                score -= 20  # The bridge holds without this stone
+        elif a == b == opp and between == own:
+            score += 50  # Cut a bridge the opponent has to answer
+    for color, value in ((own, 30), (opp, 25)):
+        # Separate runs of a color around the cell: a stone here joins them
+        runs = sum(digits[k] == color and digits[k - 1] != color for k in range(6))
+        if runs > 1:
+            score += value * (runs - 1)
+    score += 4 * digits.count(own) + 3 * digits.count(opp) - 2 * digits.count(OBSTACLE)
+    return score
+
+def ring_types(digits, player):
+    """Clockwise types of a ring as the engine's is_useless reads them"""
+    own = 1 + player
+    return [OPEN if d == EMPTY else OWN if d == own else BLOCKED for d in digits]
+
+def outer_value(place, digit, player):
+    """Priority added by one outer digit"""
+    if digit == EMPTY:
+        return 0
+    bridge = place % 2 == 0
+    if digit == 1 + player:
+        return 8 if bridge else 2  # Bridge (or edge template) to an own stone
+    return 6 if bridge else 2  # Stand in the way of the opponent's bridge
+
+def build_tables():
+    """Generate the tables in memory"""
+    ring_priority = []
+    for player in (RED, BLUE):
+        ring_priority.append(bytes(max(0, min(255, 64 + ring_score(ring_digits(code), player)))
+                                   for code in range(RING_CODES)))
+    dead = bytes(all(is_useless(ring_types(ring_digits(code), p)) for p in (RED, BLUE))
+                 for code in range(RING_CODES))
+    outer_priority = []
+    for player in (RED, BLUE):
+        table = [0]
+        for place in range(12):  # The score is a sum over places, so build it place by place
+            values = [outer_value(place, digit, player) for digit in range(3)]
+            table = [t + v for v in values for t in table]
+        outer_priority.append(bytes(table))
+    return PatternTables(ring_priority, outer_priority, dead)
+
+# Function to write the tables to a file
+def write_tables(path, tables):
+    payload = b"".join(tables.ring_priority + [tables.dead] + tables.outer_priority)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RING_CODES, OUTER_CODES))
+        f.write(zlib.compress(payload, 9))
+
+def read_tables(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, ring_codes, outer_codes = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or (ring_codes, outer_codes) != (RING_CODES, OUTER_CODES):
+        raise ValueError(f"{path} is not a version {VERSION} pattern table file")
+    payload = zlib.decompress(data[HEADER.size:])
+    parts = [payload[i * RING_CODES:(i + 1) * RING_CODES] for i in range(3)]
+    start = 3 * RING_CODES
+    outer = [payload[start + i * OUTER_CODES:start + (i + 1) * OUTER_CODES] for i in range(2)]
+    return PatternTables(parts[:2], outer, parts[2])
+
+@lru_cache(maxsize=None)
+def pattern_tables(path=PATTERN_FILE):
+    """The shipped tables, or freshly built ones if the file is missing"""
+    if os.path.exists(path):
+        return read_tables(path)
+    return build_tables()
+
+
+class PatternCodes:
+    """Ring and outer codes of every cell of a board, kept current on make/unmake"""
+
+    def __init__(self, board):
+        geometry = board.geometry
+        hoods = board_neighborhoods(geometry.rows, geometry.cols)
+        self.tables = pattern_tables()
+        self.ring_deltas = hoods.ring_deltas
+        self.outer_deltas = hoods.outer_deltas
+        self.ring = list(hoods.ring_base)
+        self.outer = list(hoods.outer_base)
+        for m in iter_bits(board.obstacle_mask):
+            for c, v in hoods.ring_weights[m]:
+                self.ring[c] += OBSTACLE * v
+        for p in (RED, BLUE):
+            for m in iter_bits(board.stones[p]):
+                self.make(m, p)
+
+    def make(self, m, p):
+        ring, outer = self.ring, self.outer
+        for c, d in self.ring_deltas[p][m]:
+            ring[c] += d
+        for c, d in self.outer_deltas[p][m]:
+            outer[c] += d
+
+    def unmake(self, m, p):
+        ring, outer = self.ring, self.outer
+        for c, d in self.ring_deltas[p][m]:
+            ring[c] -= d
+        for c, d in self.outer_deltas[p][m]:
+            outer[c] -= d
+
+    def dead_mask(self, empty):
+        """Mask of the empty cells that are dead, as dead_cells() finds them"""
+        dead = self.tables.dead
+        ring = self.ring
+        mask = 0
+        for c in iter_bits(empty):
+            if dead[ring[c]]:
+                mask |= 1 << c
+        return mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Hex pattern tables")
+    parser.add_argument("--out", default=PATTERN_FILE)
+    args = parser.parse_args()
+    write_tables(args.out, build_tables())
+    print(f"wrote {os.path.getsize(args.out)} bytes to {args.out}")
+
+if __name__ == "__main__":
+    main()
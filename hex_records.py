@@ -0,0 +1,217 @@
+"""Compact binary game records and a streaming batch analyzer.
+
+    python hex.py --record games.hexrec
+    python hex_bench.py match --games 1000 --record games.hexrec
+    python hex_records.py games.hexrec --depth 3 --out analysis.jsonl
+
+A record file is a 7-byte header (b"HEXREC" and a version byte) followed
+by records, back to back. Each record is a 9-byte head (rows, cols, the
+game's 32-bit bonus seed, obstacle count and move count, little-endian),
+then the obstacle cells and the moves as cell indices: one byte each on
+boards of up to 256 cells, two bytes on larger ones. A game of 8x8 with
+three obstacles and 40 moves takes 52 bytes. Records are only ever
+appended, so games from many runs can share one file, and a reader needs
+nothing but the bytes in front of it.
+
+Replaying a record reproduces the game exactly: GameState.restart() draws
+the bonus counters from the recorded seed. The analyzer reads records
+lazily, replays each game in a pool process and searches every position
+to a fixed depth, scoring the best move and the move played. A move that
+throws away a proven win, walks into a proven loss, or costs
+BLUNDER_MARGIN or more is flagged as a blunder. At most a few games per
+worker are in flight, so corpora of any size stream through in constant
+memory; results come out as JSON lines, one game per line, in file order.
+"""
+import argparse
+import json
+import multiprocessing
+import struct
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from hex_engine import FORCED_SCORE, AlphaBeta, GameState, TranspositionTable
+
+MAGIC = b"HEXREC"
+VERSION = 1
+FILE_HEADER = struct.Struct("<6sB")
+RECORD_HEAD = struct.Struct("<BBIBH")  # rows, cols, bonus seed, obstacles, moves
+
+BLUNDER_MARGIN = 2  # Loss in evaluation units (path-length difference) flagged as a blunder
+
+GameRecord = namedtuple("GameRecord", "rows cols bonus_seed obstacles moves")
+
+
+# Function to take the record of a game from its state
+def game_record(state):
+    return GameRecord(state.rows, state.cols, state.bonus_seed,
+                      tuple(sorted(state.obstacles)), tuple(state.moves))
+
+def replay(record):
+    """Yield (state, move) before every move of a recorded game
+
+    The same state object is played forward between yields; copy it to
+    keep a position.
+    """
+    state = GameState(record.rows, record.cols, record.obstacles)
+    state.restart(new_obstacles=False, bonus_seed=record.bonus_seed)
+    for move in record.moves:
+        yield state, move
+        if not state.play(move):
+            raise ValueError(f"illegal move {move} in record")
+
+
+# Function to get the struct code of one cell index on a board
+def cell_format(rows, cols):
+    return "B" if rows * cols <= 256 else "H"
+
+def encode_record(record):
+    """Bytes of one record"""
+    cols = record.cols
+    cells = [r * cols + c for r, c in record.obstacles] + [r * cols + c for r, c in record.moves]
+    code = cell_format(record.rows, cols)
+    return (RECORD_HEAD.pack(record.rows, cols, record.bonus_seed,
+                             len(record.obstacles), len(record.moves))
+            + struct.pack(f"<{len(cells)}{code}", *cells))
+
+def read_record(f):
+    """Next record from a file positioned at one, or None at the end"""
+    head = f.read(RECORD_HEAD.size)
+    if not head:
+        return None
+    if len(head) < RECORD_HEAD.size:
+        raise ValueError("truncated game record")
+    rows, cols, bonus_seed, obstacle_count, move_count = RECORD_HEAD.unpack(head)
+    cell = struct.Struct(f"<{obstacle_count + move_count}{cell_format(rows, cols)}")
+    body = f.read(cell.size)
+    if len(body) < cell.size:
+        raise ValueError("truncated game record")
+    cells = [divmod(i, cols) for i in cell.unpack(body)]
+    return GameRecord(rows, cols, bonus_seed, tuple(cells[:obstacle_count]),
+                      tuple(cells[obstacle_count:]))
+
+
+class RecordWriter:
+    """Appends records to a file, writing the header if the file is new"""
+
+    def __init__(self, path):
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def append(self, record):
+        self.file.write(encode_record(record))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def iter_records(path):
+    """Yield the records of a file one at a time"""
+    with open(path, "rb") as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size or FILE_HEADER.unpack(header) != (MAGIC, VERSION):
+            raise ValueError(f"{path} is not a version {VERSION} game record file")
+        while True:
+            record = read_record(f)
+            if record is None:
+                return
+            yield record
+
+
+# Function to search one move of the root position to a fixed depth
+def move_value(search, move, depth):
+    player = search.player
+    search.make(move, player)
+    try:
+        value = search.win_value(player, depth, search.schedule)
+        if value is None:
+            value, _ = search.after_move(float('-inf'), float('inf'), depth - 1, 1, search.schedule)
+    finally:
+        search.unmake(move, player)
+    return value
+
+def is_blunder(best, played):
+    if best > FORCED_SCORE and played <= FORCED_SCORE:
+        return True  # A proven win let slip
+    if played < -FORCED_SCORE and best >= -FORCED_SCORE:
+        return True  # A proven loss walked into
+    return best - played >= BLUNDER_MARGIN
+
+def analyze_game(record, depth=3, tt=None):
+    """Evaluation of every move of a game, from its mover's side"""
+    moves = []
+    for state, move in replay(record):
+        player = state.current_player()
+        if tt is not None:
+            tt.new_search()
+        search = AlphaBeta(state, player, tt)
+        best_value, pv = search.search(depth)
+        best = state.board.cell(pv[0]) if pv else None
+        if best == move:
+            value = best_value
+        else:
+            value = move_value(search, state.board.index(*move), depth)
+        moves.append({"move": list(move), "player": player, "value": value,
+                      "best": None if best is None else list(best), "best_value": best_value,
+                      "blunder": is_blunder(best_value, value)})
+    return moves
+
+# Per worker process state
+_worker_tt = None
+
+def _init_worker(tt_mb):
+    global _worker_tt
+    _worker_tt = TranspositionTable(tt_mb)
+
+# Function to analyze one game; runs in a pool process
+def _analyze_job(job):
+    index, record, depth = job
+    _worker_tt.clear()  # Positions of another game would only crowd the table
+    return index, analyze_game(record, depth, _worker_tt)
+
+def analyze_stream(records, depth=3, workers=None, tt_mb=16):
+    """Yield (game number, move evaluations) for each record, in order
+
+    records may be any iterable, typically iter_records(path); it is read
+    only as fast as the pool works through it.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(tt_mb,)) as pool:
+        pending = deque()
+        for job in enumerate(records):
+            pending.append(pool.submit(_analyze_job, job + (depth,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded Hex games")
+    parser.add_argument("path", help="game record file")
+    parser.add_argument("--depth", type=int, default=3, help="search depth per position")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--tt-mb", type=int, default=16)
+    parser.add_argument("--out", help="JSON-lines output file (default stdout)")
+    args = parser.parse_args()
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    games = blunders = 0
+    try:
+        for index, moves in analyze_stream(iter_records(args.path), args.depth,
+                                           args.jobs, args.tt_mb):
+            games += 1
+            blunders += sum(m["blunder"] for m in moves)
+            out.write(json.dumps({"game": index, "moves": moves}) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{games} games, {blunders} blunders", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Electrical-resistance evaluation for the Alpha-Beta search (needs NumPy).
+
+The classic Hex circuit model: for each player the board is a network
+between their two edges. An empty cell is a 1 ohm resistor, an own stone
+nearly a short circuit, and an opponent stone or an obstacle an open
+circuit. Neighboring cells are joined through both of their resistances
+and the edge rows are wired to the edges. The effective resistance
+between the edges falls with every extra route, so unlike the shortest
+path length it sees how many ways a player has to connect. A position
+is worth RESISTANCE_SCALE * log(R_opponent / R_player).
+
+Each circuit is solved with nodal analysis: the edge voltages are fixed
+at 1 and 0, and a small leak to the far edge keeps cells the player can
+no longer reach solvable. Cells only touch cells of their own and the
+two neighboring lines (rows or columns, whichever are shorter), so
+taken line by line the system is block tridiagonal. It is solved by
+block elimination, one small line-sized solve per line, which costs
+lines * cells_per_line**3 instead of cells**3: 361 times less on
+19x19. Above the leaves the search asks for the children of a node at
+once, and the circuits of all of them go through the elimination
+together as one NumPy batch. Results are cached by the position's
+Zobrist hash, so a position met again, in this or a later search, is
+not solved twice.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from hex_engine import RED, BLUE, iter_bits
+
+EMPTY, RED_STONE, BLUE_STONE, OBSTACLE = 0, 1, 2, 3  # Cell codes, as in hex_mcts
+
+STONE_RESISTANCE = 1e-3  # Own stones conduct almost perfectly
+LEAK = 1e-6  # Conductance from every cell to the far edge
+MIN_CURRENT = 1e-12  # Floor for a player cut off from one edge
+RESISTANCE_SCALE = 10  # Evaluation points per e-fold of resistance ratio
+
+
+class Circuit:
+    """NumPy tables for one board size: neighbor pairs and edge cells
+
+    Cells are ordered line by line here, a line being a row or a column,
+    whichever is shorter, and every neighbor pair is sorted into the
+    block it falls in: within a line, or between a line and the next.
+    """
+
+    def __init__(self, geometry):
+        n = self.size = geometry.size
+        rows, cols = geometry.rows, geometry.cols
+        by_rows = cols <= rows
+        self.lines, self.width = (rows, cols) if by_rows else (cols, rows)
+        line = [cell // cols if by_rows else cell % cols for cell in range(n)]
+        self.order = np.array(sorted(range(n), key=lambda cell: (line[cell], cell)), dtype=np.intp)
+        place = [cell % cols if by_rows else cell // cols for cell in range(n)]
+
+        # Each pair once, the cell of the lower line (or of the line, within one) first
+        pairs = [(a, b) for a, nbrs in enumerate(geometry.neighbors) for b in nbrs
+                 if (line[a], a) < (line[b], b)]
+        self.a = np.array([a for a, _ in pairs], dtype=np.intp)
+        self.b = np.array([b for _, b in pairs], dtype=np.intp)
+        self.incidence = np.zeros((len(pairs), n))  # Pair -> its two cells, for the diagonal
+        self.incidence[np.arange(len(pairs)), self.a] = 1
+        self.incidence[np.arange(len(pairs)), self.b] = 1
+        # Block coordinates of each pair: its lower line, the place in that
+        # line and the place in the same or the next line
+        self.inner = np.array([line[a] == line[b] for a, b in pairs], dtype=bool)
+        self.pair_line = np.array([line[a] for a, _ in pairs], dtype=np.intp)
+        self.place_a = np.array([place[a] for a, _ in pairs], dtype=np.intp)
+        self.place_b = np.array([place[b] for _, b in pairs], dtype=np.intp)
+
+        self.start = np.zeros((2, n), dtype=bool)
+        self.end = np.zeros((2, n), dtype=bool)
+        for p in (RED, BLUE):
+            self.start[p, geometry.start_cells[p]] = True
+            self.end[p, geometry.end_cells[p]] = True
+
+    def resistances(self, cells):
+        """Edge-to-edge resistance of both players for a (boards, cells) array of codes
+
+        Returns a (boards, 2) array, indexed by player.
+        """
+        boards, n = cells.shape
+        r = np.full((2, boards, n), np.inf)
+        for p in (RED, BLUE):
+            r[p][cells == EMPTY] = 1.0
+            r[p][cells == RED_STONE + p] = STONE_RESISTANCE
+        conductance = 1 / (r[..., self.a] + r[..., self.b])  # Zero across an open cell
+        to_start = np.where(self.start[:, None, :], 1 / r, 0)
+        to_end = np.where(self.end[:, None, :], 1 / r, 0)
+        diagonal = conductance @ self.incidence + to_start + to_end + LEAK
+
+        # Diagonal blocks (one per line) and the blocks below them (line i+1
+        # against line i); the blocks above are their transposes
+        shape = (2, boards, self.lines, self.width, self.width)
+        blocks = np.zeros(shape)
+        below = np.zeros(shape)
+        inner, outer = self.inner, ~self.inner
+        lines, place_a, place_b = self.pair_line, self.place_a, self.place_b
+        blocks[..., lines[inner], place_a[inner], place_b[inner]] = -conductance[..., inner]
+        blocks[..., lines[inner], place_b[inner], place_a[inner]] = -conductance[..., inner]
+        below[..., lines[outer], place_b[outer], place_a[outer]] = -conductance[..., outer]
+        ordered = diagonal[..., self.order].reshape(shape[:-1])
+        blocks[..., np.arange(self.width), np.arange(self.width)] += ordered
+        voltage = self.solve(blocks, below, to_start[..., self.order].reshape(shape[:-1]))
+        current = (to_start[..., self.order] * (1 - voltage.reshape(2, boards, n))).sum(axis=2)
+        return (1 / np.maximum(current, MIN_CURRENT)).T
+
+    def solve(self, blocks, below, rhs):
+        """Block tridiagonal solve, batched over the leading axes
+
+        Eliminates line by line (x[i] = y[i] - F[i] x[i+1]), then
+        substitutes back from the last line.
+        """
+        lines, width = self.lines, self.width
+        factors = np.empty(blocks.shape[:-3] + (lines - 1, width, width))
+        values = np.empty(rhs.shape)
+        pivot, y = blocks[..., 0, :, :], rhs[..., 0, :]
+        for i in range(lines - 1):
+            lower = below[..., i, :, :]
+            step = np.linalg.solve(pivot, np.concatenate(
+                (np.swapaxes(lower, -1, -2), y[..., None]), axis=-1))
+            factors[..., i, :, :], values[..., i, :] = step[..., :width], step[..., width]
+            pivot = blocks[..., i + 1, :, :] - lower @ step[..., :width]
+            y = rhs[..., i + 1, :] - (lower @ step[..., width:])[..., 0]
+        x = np.empty(rhs.shape)
+        x[..., -1, :] = np.linalg.solve(pivot, y[..., None])[..., 0]
+        for i in range(lines - 2, -1, -1):
+            x[..., i, :] = values[..., i, :] - (factors[..., i, :, :] @ x[..., i + 1, :, None])[..., 0]
+        return x
+
+@lru_cache(maxsize=None)
+def board_circuit(geometry):
+    return Circuit(geometry)
+
+def board_cells(board):
+    """Cell codes of a Board as a NumPy array"""
+    cells = np.zeros(board.geometry.size, dtype=np.int8)
+    for player in (RED, BLUE):
+        cells[list(iter_bits(board.stones[player]))] = RED_STONE + player
+    cells[list(iter_bits(board.obstacle_mask))] = OBSTACLE
+    return cells
+
+
+class ResistanceEvaluator:
+    """Position values from both players' resistances, cached by board hash"""
+
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self.cache = {}  # board hash -> (red resistance, blue resistance)
+        self.solved = 0  # Circuits solved, two per position
+
+    def value(self, resist, player):
+        return RESISTANCE_SCALE * math.log(resist[1 - player] / resist[player])
+
+    def store(self, key, resist):
+        if len(self.cache) >= self.max_entries:
+            self.cache.clear()
+        self.cache[key] = resist
+
+    def evaluate(self, board, player):
+        """Value of the position for player"""
+        resist = self.cache.get(board.hash)
+        if resist is None:
+            resist = tuple(board_circuit(board.geometry).resistances(board_cells(board)[None])[0])
+            self.solved += 2
+            self.store(board.hash, resist)
+        return self.value(resist, player)
+
+    def child_values(self, board, moves, mover, player):
+        """Values for player after each of mover's moves, solved in one batch"""
+        stone_keys = board.geometry.stone_keys[mover]
+        keys = [board.hash ^ stone_keys[m] for m in moves]
+        cache = self.cache
+        missing = [i for i, key in enumerate(keys) if key not in cache]
+        if missing:
+            cells = np.repeat(board_cells(board)[None], len(missing), axis=0)
+            cells[np.arange(len(missing)), [moves[i] for i in missing]] = RED_STONE + mover
+            resist = board_circuit(board.geometry).resistances(cells)
+            self.solved += 2 * len(missing)
+            if len(cache) + len(missing) > self.max_entries:
+                cache.clear()
+            for i, row in zip(missing, resist):
+                cache[keys[i]] = tuple(row)
+        return [self.value(cache[key], player) for key in keys]
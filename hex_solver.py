@@ -0,0 +1,210 @@
+"""Exact endgame solver for Hex with depth-first proof-number search (df-pn).
+
+The solver proves whether one player (the prover) wins for sure from a
+position: OR nodes are the prover's moves, AND nodes the opponent's
+moves and the counter redraw after every bonus move, since a win that
+depends on a lucky draw is not a proof. Moves are made on the Board's
+incremental union-find, so a finished connection is seen at once; dead
+cells are never tried, and a virtual connection the mover has time to
+complete ends the line early, as in the Alpha-Beta search.
+
+Proof and disproof numbers start from each player's shortest path
+length and are kept in a transposition table keyed by the board hash
+and the bonus-move schedule. The search gives up once it has expanded
+max_nodes nodes, the table holds max_entries positions or the deadline
+passes, and the engine then falls back to its heuristic search.
+"""
+import random
+import time
+
+from hex_engine import (NO_PATH, dead_cells, game_schedule, guaranteed_moves,
+                        iter_bits, next_schedule, redraw_outcomes, schedule_key,
+                        schedule_mover, shortest_path_length, virtual_connection)
+
+INF = 10 ** 9  # Proof or disproof number of a settled node
+
+WIN, LOSS, NO_FORCED_WIN = 1, -1, 0  # Results of solve_endgame for the player to move
+
+CHANCE_KEY = random.Random("chance node").getrandbits(64)  # Marks redraws pending in node keys
+
+
+class SolverLimit(Exception):
+    """Raised when the node or memory budget runs out"""
+
+
+class EndgameSolver:
+    """df-pn prover over one board; the table is kept across prove() calls"""
+
+    CHECK_EVERY = 256  # Nodes between clock checks
+
+    def __init__(self, state, max_nodes=200000, max_entries=500000, deadline=None, stop=None):
+        self.board = state.board.copy()
+        self.schedule = game_schedule(state)
+        self.max_nodes = max_nodes
+        self.max_entries = max_entries
+        self.deadline = deadline  # time.perf_counter() value
+        self.stop = stop  # Event-like object; the proof is abandoned once it is set
+        self.nodes = 0
+        self.table = {}  # (key, prover) -> [proof number, disproof number, children or None]
+
+    def prove(self, prover):
+        """True if prover surely wins, False if not, None if the budget ran out"""
+        key = self.node_key(self.schedule, False)
+        self.entry(key, prover)
+        try:
+            self.mid(key, prover, self.schedule, False, INF - 1, INF - 1)
+        except SolverLimit:
+            return None
+        pn, dn, _ = self.table[key, prover]
+        if pn == 0:
+            return True
+        if dn == 0:
+            return False
+        return None
+
+    def winning_move(self, prover):
+        """A move of the prover's that keeps a proven win, at the root"""
+        _, _, children = self.table[self.node_key(self.schedule, False), prover]
+        for move, child_key, _, _ in children or ():
+            if self.table[child_key, prover][0] == 0:
+                return self.board.cell(move)
+        return None
+
+    def node_key(self, schedule, chance):
+        key = self.board.hash ^ schedule_key(self.board.geometry, schedule)
+        return key ^ CHANCE_KEY if chance else key
+
+    def entry(self, key, prover):
+        """Table entry for the current board, estimated when first seen"""
+        found = self.table.get((key, prover))
+        if found is None:
+            if len(self.table) >= self.max_entries:
+                raise SolverLimit()
+            board = self.board
+            own = shortest_path_length(board, prover)
+            if own >= NO_PATH:
+                found = [INF, 0, None]  # The prover is cut off
+            else:
+                other = shortest_path_length(board, 1 - prover)
+                empty = bin(board.empty_mask()).count("1")
+                found = [own, other if other < NO_PATH else empty + 1, None]
+            self.table[key, prover] = found
+        return found
+
+    def outcome(self, mover, schedule, prover):
+        """Entry for a settled position right after mover played, or None"""
+        board = self.board
+        if board.is_connected(mover):
+            return [0, INF, None] if mover == prover else [INF, 0, None]
+        if not board.empty_mask():
+            return [INF, 0, None]  # Draw: no win for the prover
+        links = virtual_connection(board, mover)
+        if links is not None and links <= guaranteed_moves(schedule, mover, INF):
+            return [0, INF, None] if mover == prover else [INF, 0, None]
+        return None
+
+    def expand(self, prover, schedule, chance):
+        """Children as (move or None, key, schedule, chance) tuples"""
+        board = self.board
+        children = []
+        if chance:
+            empty = bin(board.empty_mask()).count("1")
+            for _, child in redraw_outcomes(schedule, empty):
+                key = self.node_key(child, False)
+                self.entry(key, prover)
+                children.append((None, key, child, False))
+            return children
+        mover = schedule_mover(schedule)
+        after = schedule if schedule[1] else next_schedule(schedule)
+        empty = board.empty_mask()
+        moves = empty & ~dead_cells(board) or empty & -empty  # Extra stones never hurt
+        for m in iter_bits(moves):
+            board.make(m, mover)
+            key = self.node_key(after, schedule[1])
+            if (key, prover) not in self.table:
+                settled = self.outcome(mover, schedule, prover)
+                if settled is not None:
+                    self.table[key, prover] = settled
+                else:
+                    self.entry(key, prover)
+            board.unmake(m, mover)
+            children.append((m, key, after, schedule[1]))
+        return children
+
+    def mid(self, key, prover, schedule, chance, pn_limit, dn_limit):
+        """Search below one node until its numbers pass the limits"""
+        node = self.table[key, prover]
+        if node[0] == 0 or node[1] == 0:
+            return
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise SolverLimit()
+        if self.nodes % self.CHECK_EVERY == 0:
+            if self.stop is not None and self.stop.is_set():
+                raise SolverLimit()
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SolverLimit()
+        if node[2] is None:
+            node[2] = self.expand(prover, schedule, chance)
+        children = node[2]
+        or_node = not chance and schedule_mover(schedule) == prover
+        mover = None if chance else schedule_mover(schedule)
+        table = self.table
+        while True:
+            # Node numbers from the children's
+            best = second = INF
+            best_child = None
+            total = 0
+            for child in children:
+                pn, dn, _ = table[child[1], prover]
+                mine, theirs = (pn, dn) if or_node else (dn, pn)
+                total = min(total + theirs, INF)
+                if mine < best:
+                    best, second, best_child = mine, best, child
+                elif mine < second:
+                    second = mine
+            node[0], node[1] = (best, total) if or_node else (total, best)
+            if best_child is None:
+                node[0], node[1] = (INF, 0) if or_node else (0, INF)
+            if node[0] >= pn_limit or node[1] >= dn_limit:
+                return
+
+            # Search the most proving child with tightened limits
+            m, child_key, child_schedule, child_chance = best_child
+            pn, dn, _ = table[child_key, prover]
+            if or_node:
+                child_pn = min(pn_limit, second + 1)
+                child_dn = dn_limit - node[1] + dn
+            else:
+                child_dn = min(dn_limit, second + 1)
+                child_pn = pn_limit - node[0] + pn
+            if m is not None:
+                self.board.make(m, mover)
+            try:
+                self.mid(child_key, prover, child_schedule, child_chance, child_pn, child_dn)
+            finally:
+                if m is not None:
+                    self.board.unmake(m, mover)
+
+
+def solve_endgame(state, max_nodes=200000, max_entries=500000, deadline=None, stop=None):
+    """Game-theoretic result for the player to move, as (result, move)
+
+    result is WIN with a winning (row, col) move, LOSS if the opponent wins
+    whatever happens, NO_FORCED_WIN if neither side can force a win (a
+    draw, or a result that hangs on the bonus draws), or None with no move
+    if the budget ran out first.
+    """
+    if state.game_over:
+        return None, None
+    player = state.current_player()
+    solver = EndgameSolver(state, max_nodes, max_entries, deadline, stop)
+    proved = solver.prove(player)
+    if proved is None:
+        return None, None
+    if proved:
+        return WIN, solver.winning_move(player)
+    proved = solver.prove(1 - player)
+    if proved is None:
+        return None, None
+    return (LOSS if proved else NO_FORCED_WIN), None
@@ -0,0 +1,119 @@
+"""Run the Hex AI in a background process so the pygame loop stays responsive.
+
+The worker process keeps one Engine (and its transposition table) alive
+for the whole game. The front end submits a search, keeps drawing, and
+polls for progress and the result once per frame.
+
+The worker is not a daemon process, so that an Engine with workers can
+start its own process pool in it. It is closed at interpreter exit, and
+it quits by itself once the front end's end of the pipe is gone.
+"""
+import atexit
+import multiprocessing
+
+from hex_engine import Engine
+
+
+class _JobStop:
+    """Event-like stop flag: set once the parent cancels this job or a later one"""
+
+    def __init__(self, cancelled, job):
+        self.cancelled = cancelled
+        self.job = job
+
+    def is_set(self):
+        return self.cancelled.value >= self.job
+
+def _serve(conn, cancelled, depth, time_ms, tt_mb, engine_options):
+    """Worker process main loop"""
+    engine = Engine(depth=depth, tt_mb=tt_mb, time_ms=time_ms, **engine_options)
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break  # The front end is gone
+            kind = message[0]
+            if kind == "quit":
+                break
+            if kind == "new_game":
+                engine.new_game()
+            elif kind == "search":
+                _, job, state, player = message
+                if conn.poll():
+                    continue  # A newer request is already waiting
+                stop = _JobStop(cancelled, job)
+
+                def report(d, nodes, job=job):
+                    conn.send(("progress", job, d, nodes))
+
+                move = engine.choose_move(state, player, stop=stop, on_progress=report)
+                if not stop.is_set():
+                    conn.send(("result", job, move))
+    finally:
+        engine.close()  # Shuts down the process pool of a parallel search
+        conn.close()
+
+
+class SearchWorker:
+    """Cancellable background search in a separate process (avoids the GIL)
+
+    Extra keyword arguments go to the worker's Engine, e.g. stats_log or
+    profile; a stats_hook must be picklable (a module-level function).
+    """
+
+    def __init__(self, depth=4, time_ms=None, tt_mb=16, **engine_options):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.cancelled = ctx.Value("q", 0, lock=False)
+        self.process = ctx.Process(target=_serve,
+                                   args=(child_conn, self.cancelled, depth, time_ms, tt_mb, engine_options))
+        self.process.start()
+        child_conn.close()
+        atexit.register(self.close)  # A non-daemon process would otherwise be waited for
+        self.job = 0
+        self.busy = False
+        self.depth = 0  # Live progress of the running search
+        self.nodes = 0
+
+    def submit(self, state, player):
+        """Start searching a snapshot of state, cancelling any running search"""
+        self.cancel()
+        self.job += 1
+        self.busy = True
+        self.depth = self.nodes = 0
+        self.conn.send(("search", self.job, state, player))
+
+    def poll(self):
+        """Process worker messages; return the chosen move once the search is done"""
+        while self.conn.poll():
+            kind, job, *payload = self.conn.recv()
+            if job != self.job or not self.busy:
+                continue  # Stale message from a cancelled search
+            if kind == "progress":
+                self.depth, self.nodes = payload
+            elif kind == "result":
+                self.busy = False
+                return payload[0]
+        return None
+
+    def cancel(self):
+        if self.busy:
+            self.cancelled.value = self.job
+            self.busy = False
+
+    def new_game(self):
+        """Cancel any search and clear the worker's transposition table"""
+        self.cancel()
+        self.conn.send(("new_game",))
+
+    def close(self):
+        atexit.unregister(self.close)
+        self.cancel()
+        try:
+            self.conn.send(("quit",))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()